@@ -0,0 +1,641 @@
+"""
+Asyncio sibling of CafeScraper built on playwright.async_api.
+
+Same extraction steps and the same record shape as CafeScraper.scrape_cafe_page,
+but every wait is awaitable, so many cafes can scroll galleries and load reviews
+at the same time inside one event loop. A semaphore bounds how many cafes are in
+flight; each one gets its own browser context.
+
+Usage:
+    python async_scraper.py --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from urllib.parse import quote
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_RATE, BLOCK_SIGNALS, TIMEOUT
+from resource_blocking import ResourceBlocker
+from scrape_metrics import ScrapeMetrics
+from scrape_journal import ScrapeJournal, task_key, default_journal_path, discard_journal, DONE, FAILED, SKIPPED
+from failure_policy import (
+    FailureTracker, classify_failure, dead_letter_path, NOT_FOUND, NETWORK, BROWSER, BLOCKED,
+)
+from page_scripts import (
+    BASIC_INFO_JS, HOURS_JS, IMAGE_URLS_JS, PHOTO_COUNT_JS, REVIEWS_JS,
+    parse_basic_info, parse_hour_rows, parse_photo_count, parse_reviews, whole_text,
+)
+from scraper import (
+    MENU_CHIP_KEYWORDS, CafeScraper, WaitSavings,
+    is_cafe_category, is_place_photo_url, get_hd_image_url, block_signal_for_url,
+    GALLERY_PANEL, GALLERY_TILE, REVIEW_BLOCK, COUNT_GREW_JS,
+    GALLERY_SCROLL_SLEEP, GALLERY_GROWTH_TIMEOUT, GALLERY_NO_CHANGE_ROUNDS,
+    REVIEW_SCROLLS, REVIEW_SCROLL_SLEEP, REVIEW_GROWTH_TIMEOUT, REVIEW_TARGET,
+)
+
+DEFAULT_CONCURRENCY = 8
+
+# CafeTimer of the cafe the current asyncio task is scraping. Many cafes are in flight
+# at once, so this can't live on the scraper like CafeScraper._timer does.
+_cafe_timer = ContextVar("cafe_timer", default=None)
+
+
+class AsyncCafeScraper:
+    def __init__(self, input_file="consolidated_list.json", concurrency=DEFAULT_CONCURRENCY,
+                 capture_network_images=False, block_resources=False, parallel_menu_chips=False,
+                 rate=DEFAULT_RATE, metrics=None):
+        self.input_file = input_file
+        # ScrapeMetrics sink for per-phase timings, shared by every in-flight cafe
+        self.metrics = metrics
+        # Shared by every in-flight cafe; a captcha on one slows them all
+        self.limiter = AdaptiveRateLimiter(rate)
+        self.parallel_menu_chips = parallel_menu_chips
+        self.block_resources = block_resources
+        self.concurrency = concurrency
+        self.capture_network_images = capture_network_images
+        self.browser = None
+        self.playwright = None
+        # Browserless CafeScraper used for region mapping and the record store
+        self.writer = CafeScraper(input_file)
+        self.wait_savings = WaitSavings()
+        self._semaphore = None
+        self._write_lock = None
+
+    def _phase(self, name):
+        timer = _cafe_timer.get()
+        return timer.phase(name) if timer else nullcontext()
+
+    def _count(self, key, n):
+        timer = _cafe_timer.get()
+        if timer:
+            timer.count(key, n)
+
+    async def start_browser(self, headless=True):
+        print(f"Starting browser (headless={headless}, concurrency={self.concurrency})...")
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(channel="msedge", headless=headless)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._write_lock = asyncio.Lock()
+        print("Browser ready!\n")
+
+    async def close_browser(self):
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    async def new_context(self, blocker=None):
+        # locale en-US so Maps shows English labels ('Overview','Menu','Reviews','About')
+        context = await self.browser.new_context(locale="en-US", extra_http_headers={"Accept-Language": "en-US,en;q=0.9"})
+        if blocker:
+            await context.route("**/*", blocker.handle_async)
+            context.on("response", blocker.on_response)
+        return context
+
+    def determine_region_file(self, address):
+        return self.writer.determine_region_file(address)
+
+    # --- Extraction Methods ---
+
+    async def extract_basic_info(self, page):
+        info = {}
+        try:
+            info = parse_basic_info(await page.evaluate(BASIC_INFO_JS))
+        except Exception as e:
+            print(f"      ERROR extracting basic info: {e}")
+        return info
+
+    async def extract_opening_hours(self, page):
+        opening_hours = []
+        try:
+            selectors = ["button[data-item-id='oh']", "button[aria-label*='Open']", "div.VkpGBb"]
+            if await page.locator("table.eK4R0e").count() == 0:
+                for sel in selectors:
+                    if await page.locator(sel).count() > 0:
+                        try:
+                            await page.locator(sel).first.click()
+                            await asyncio.sleep(1)
+                            break
+                        except: continue
+
+            opening_hours = parse_hour_rows(await page.evaluate(HOURS_JS))
+        except Exception as e:
+            print(f"      ERROR extracting hours: {e}")
+        return opening_hours
+
+    async def _wait_for_count_growth(self, page, selector, previous, timeout, fixed_sleep):
+        """Wait until more than `previous` elements match selector; False on timeout."""
+        t0 = time.time()
+        try:
+            await page.wait_for_function(COUNT_GREW_JS, arg=[selector, previous],
+                                         timeout=timeout * 1000, polling=100)
+            grew = True
+        except Exception:
+            grew = False
+        self.wait_savings.add(fixed_sleep, time.time() - t0)
+        return grew
+
+    async def _scroll_gallery_panel(self, page, max_scrolls=60):
+        """Scroll the thumbnail panel until no more content is added or max reached."""
+        try:
+            last_count = await page.locator(GALLERY_TILE).count()
+            no_change_count = 0
+
+            for i in range(max_scrolls):
+                await page.evaluate(f"document.querySelector('{GALLERY_PANEL}').scrollTop += 5000")
+                await self._wait_for_count_growth(page, GALLERY_TILE, last_count, GALLERY_GROWTH_TIMEOUT, GALLERY_SCROLL_SLEEP)
+
+                current_count = await page.locator(GALLERY_TILE).count()
+                if current_count == last_count:
+                    no_change_count += 1
+                    if no_change_count >= GALLERY_NO_CHANGE_ROUNDS:
+                        self.wait_savings.skip((5 - GALLERY_NO_CHANGE_ROUNDS) * GALLERY_SCROLL_SLEEP)
+                        break
+                else:
+                    no_change_count = 0
+                last_count = current_count
+        except Exception as e:
+            print(f"      scroll warning: {e}")
+
+    async def _extract_images_from_dom(self, page, img_marker="googleusercontent"):
+        """Extract all googleusercontent images (bg-image divs + img tags) from current DOM."""
+        urls = await page.evaluate(IMAGE_URLS_JS, img_marker)
+        return {get_hd_image_url(u) for u in urls if "googleusercontent.com" in u}
+
+    async def _collect_gallery_images(self, page, captured):
+        """Images for the current gallery view: captured responses, or a DOM walk."""
+        if captured is not None:
+            imgs = set(captured)
+            captured.clear()
+            return imgs
+        return await self._extract_images_from_dom(page)
+
+    async def _gather_menu_chip(self, context, place_url, chip_text):
+        """Menu-chip images from a sibling page of the same context."""
+        chip_page = await context.new_page()
+        try:
+            await chip_page.goto(place_url, timeout=30000)
+            await chip_page.locator("button.aoRNLd").first.click(timeout=10000)
+            await chip_page.wait_for_selector("button.hh2c6", timeout=8000)
+            # "Menu" must not also click "Menu Minuman"
+            await chip_page.locator("button.hh2c6", has_text=whole_text(chip_text)).first.click(timeout=3000)
+            await self._wait_for_count_growth(chip_page, GALLERY_TILE, 0, GALLERY_GROWTH_TIMEOUT, 2)
+            await self._scroll_gallery_panel(chip_page, max_scrolls=20)
+            images = await self._extract_images_from_dom(chip_page)
+            print(f"      [Parallel chips] '{chip_text}': {len(images)} images")
+            return images
+        except Exception as e:
+            print(f"      [Parallel chips] '{chip_text}' failed: {e}")
+            return set()
+        finally:
+            await chip_page.close()
+
+    async def _open_gallery_and_get_all(self, page):
+        """
+        Opens the photo gallery and returns:
+        { 'all': set_of_cafe_photo_urls, 'menu': set_of_menu_photo_urls }
+        """
+        result = {'all': set(), 'menu': set()}
+        # The gallery changes the URL; sibling chip pages need the place page itself
+        place_url = page.url
+        captured = None
+        handler = None
+        cdp = None
+        try:
+            photo_btn = page.locator("button.aoRNLd").first
+            if await photo_btn.count() == 0:
+                print("      No gallery button — using fallback")
+                result['all'].update(await self._extract_images_from_dom(page))
+                return result
+
+            if self.capture_network_images:
+                captured = set()
+                try:
+                    cdp = await page.context.new_cdp_session(page)
+                    await cdp.send("Network.setCacheDisabled", {"cacheDisabled": True})
+                except Exception as e:
+                    print(f"      cache disable warning: {e}")
+
+                def on_response(response):
+                    if response.request.resource_type == "image" and is_place_photo_url(response.url):
+                        captured.add(get_hd_image_url(response.url))
+
+                page.on("response", on_response)
+                handler = on_response
+            await photo_btn.click(timeout=10000)
+
+            try:
+                await page.wait_for_selector("button.hh2c6", timeout=8000)
+            except:
+                print("      Gallery chips not found — may still have images")
+            await asyncio.sleep(1)
+
+            # Close any login modal
+            try:
+                for close_sel in ["button.Cwoqlf", "button[aria-label='Close']", "button[aria-label='Tutup']"]:
+                    c = page.locator(close_sel)
+                    if await c.count() > 0:
+                        await c.first.click(timeout=2000)
+                        await asyncio.sleep(1)
+                        break
+            except: pass
+
+            chips = await page.locator("button.hh2c6").all()
+            chip_texts = []
+            for c in chips:
+                try:
+                    chip_texts.append((await c.inner_text()).strip())
+                except:
+                    chip_texts.append("")
+
+            self._count('chips', len(chips))
+
+            # --- Step 1: Collect ALL cafe photos ---
+            await self._scroll_gallery_panel(page, max_scrolls=40)
+            result['all'].update(await self._collect_gallery_images(page, captured))
+
+            # --- Step 2: Collect Menu & Food photos ---
+            menu_related = [(c, t) for c, t in zip(chips, chip_texts)
+                            if any(x in t.lower() for x in MENU_CHIP_KEYWORDS)]
+            menu_related_chips = [c for c, _ in menu_related]
+            self._count('menu_chips', len(menu_related))
+            if self.parallel_menu_chips and len(menu_related) > 1:
+                for images in await asyncio.gather(*(self._gather_menu_chip(page.context, place_url, t)
+                                                     for _, t in menu_related)):
+                    result['menu'].update(images)
+                menu_related_chips = []
+            for chip in menu_related_chips:
+                try:
+                    if captured is not None:
+                        captured.clear()
+                    await chip.click(timeout=3000)
+                    await asyncio.sleep(2)
+                    await self._scroll_gallery_panel(page, max_scrolls=20)
+                    result['menu'].update(await self._collect_gallery_images(page, captured))
+                except: pass
+
+            await page.keyboard.press("Escape")
+            await asyncio.sleep(1)
+
+        except Exception as e:
+            print(f"      ERROR opening gallery: {e}")
+            try:
+                await page.keyboard.press("Escape")
+                await asyncio.sleep(1)
+            except: pass
+        finally:
+            if handler:
+                page.remove_listener("response", handler)
+            if cdp:
+                try:
+                    await cdp.detach()
+                except: pass
+        return result
+
+    async def extract_menu_images(self, page, gallery):
+        """Extracts menu images from gallery Menu chip AND sidebar Menu tab."""
+        menu = {"link": None, "images": []}
+        image_urls = set()
+        try:
+            # 1. Check for external menu link
+            menu_link_el = page.locator("a[data-item-id='menu'], button[data-item-id='menu']")
+            if await menu_link_el.count() > 0:
+                href = await menu_link_el.get_attribute("href") or ""
+                menu["link"] = href
+                if "drive.google.com" in href or href.endswith(".pdf"):
+                    return menu
+
+            # 2. Gallery Menu chip
+            image_urls.update(gallery.get('menu', set()))
+
+            # 3. Sidebar Menu tab
+            menu_tab = None
+            overview_tab = None
+            for t in await page.locator("button.hh2c6").all():
+                try:
+                    text = (await t.inner_text()).strip()
+                    if text.lower() in ('menu', 'menu & harga', 'menu & prices'):
+                        menu_tab = t
+                    if text.lower() in ('overview', 'ringkasan'):
+                        overview_tab = t
+                except: pass
+
+            if menu_tab:
+                await menu_tab.click(timeout=5000)
+                await asyncio.sleep(3)
+
+                for _ in range(10):
+                    await page.keyboard.press("PageDown")
+                    await asyncio.sleep(0.5)
+                    await page.mouse.wheel(0, 1000)
+                    await asyncio.sleep(0.5)
+
+                image_urls.update(await self._extract_images_from_dom(page, img_marker="p/AF1Qip"))
+
+                if overview_tab:
+                    await overview_tab.click(timeout=3000)
+                    await asyncio.sleep(1)
+
+        except Exception as e:
+            print(f"      ERROR extraction menu: {e}")
+
+        menu["images"] = list(image_urls)
+        return menu
+
+    async def extract_customer_reviews(self, page):
+        reviews = []
+        try:
+            found_tab = False
+            for tab in await page.locator("button.hh2c6").all():
+                text = (await tab.inner_text()).lower()
+                if "review" in text or "ulasan" in text:
+                    await tab.click()
+                    await asyncio.sleep(2)
+                    found_tab = True
+                    break
+
+            if not found_tab:
+                rev_tab = page.locator('button[role="tab"][aria-label*="Review"], button[role="tab"][aria-label*="Ulasan"]').first
+                if await rev_tab.count() > 0:
+                    await rev_tab.click()
+                    await asyncio.sleep(2)
+
+            # Scroll to load more reviews, stopping once enough have rendered
+            last_count = await page.locator(REVIEW_BLOCK).count()
+            for i in range(REVIEW_SCROLLS):
+                if last_count >= REVIEW_TARGET:
+                    self.wait_savings.skip((REVIEW_SCROLLS - i) * REVIEW_SCROLL_SLEEP)
+                    break
+                await page.evaluate(f"document.querySelector('{GALLERY_PANEL}').scrollTop += 3000")
+                if not await self._wait_for_count_growth(page, REVIEW_BLOCK, last_count, REVIEW_GROWTH_TIMEOUT, REVIEW_SCROLL_SLEEP):
+                    self.wait_savings.skip((REVIEW_SCROLLS - i - 1) * REVIEW_SCROLL_SLEEP)
+                    break
+                last_count = await page.locator(REVIEW_BLOCK).count()
+
+            # Expand "More" buttons safely using JS
+            await page.evaluate("""
+                document.querySelectorAll('button.w8oYf, span.w8oYf, button.w8nwRe.kyuRq').forEach(btn => {
+                    if (btn.innerText.includes('More') || btn.innerText.includes('Lainnya') || btn.getAttribute('aria-label')?.includes('More')) {
+                        btn.click();
+                    }
+                });
+            """)
+            await asyncio.sleep(1.5)
+
+            reviews = parse_reviews(await page.evaluate(REVIEWS_JS, REVIEW_TARGET))
+        except Exception as e:
+            print(f"      ERROR reviews: {e}")
+        return reviews
+
+    async def scrape_cafe_page(self, page, url, outcome=None):
+        """outcome, if given, receives 'skip' when the place is dropped on purpose."""
+        stage = 'load'
+        try:
+            with self._phase('goto'):
+                await page.goto(url, timeout=30000)
+                stage = 'place'
+                await page.wait_for_selector("h1.DUwDvf", timeout=10000)
+                await asyncio.sleep(2)
+            stage = 'extract'
+
+            with self._phase('basic_info'):
+                data = await self.extract_basic_info(page)
+
+            if not is_cafe_category(data.get('category')):
+                print(f"      Skipping non-cafe category: '{data.get('category')}'")
+                if outcome is not None:
+                    outcome['skip'] = f"non-cafe category: {data.get('category')}"
+                return None
+
+            data['link'] = url
+            data['scraped_at'] = datetime.now().isoformat(timespec='seconds')
+            try:
+                with self._phase('photo_count'):
+                    photos_count = parse_photo_count(await page.evaluate(PHOTO_COUNT_JS))
+                if photos_count is not None:
+                    data['photos_count'] = photos_count
+            except Exception:
+                pass
+            with self._phase('opening_hours'):
+                data['opening_hours'] = await self.extract_opening_hours(page)
+
+            # Open gallery ONCE — collect all cafe photos + menu photos in one pass
+            with self._phase('gallery'):
+                gallery = await self._open_gallery_and_get_all(page)
+
+            data['photos'] = list(gallery.get('all', set()))
+            with self._phase('menu'):
+                data['menu'] = await self.extract_menu_images(page, gallery)
+            self._count('tiles', len(data['photos']))
+            self._count('menu_images', len(data['menu'].get('images', [])))
+            with self._phase('reviews'):
+                data['customer_reviews'] = await self.extract_customer_reviews(page)
+            self._count('reviews', len(data['customer_reviews']))
+            return data
+        except Exception as e:
+            print(f"  ✗ Error scraping page: {e}")
+            self._note_failure(page, e, outcome, stage)
+            return None
+
+    def _note_failure(self, page, error, outcome, stage=None):
+        """
+        Put the failure class into outcome['failure'] and a captcha/consent/timeout
+        signal behind a failed page into outcome['signal'].
+        """
+        signal = block_signal_for_url(page.url)
+        if outcome is not None:
+            outcome['failure'] = classify_failure(error, stage, blocked=bool(signal))
+        if not signal and isinstance(error, PlaywrightTimeoutError):
+            signal = TIMEOUT
+        if signal and outcome is not None:
+            outcome['signal'] = signal
+
+    async def scrape_direct(self, page, name, address, outcome=None):
+        """Use direct search URL"""
+        url = f"https://www.google.com/maps/search/{quote(f'{name} {address}')}"
+
+        try:
+            with self._phase('search'):
+                await page.goto(url, timeout=30000)
+                await asyncio.sleep(2)
+
+                # Click first result if list view
+                if "search" in page.url:
+                    try:
+                        await page.wait_for_selector("a[href*='/maps/place/']", timeout=5000)
+                        await page.locator("a[href*='/maps/place/']").first.click()
+                        await asyncio.sleep(2)
+                    except: pass
+
+            try:
+                with self._phase('search'):
+                    await page.wait_for_selector("h1.DUwDvf", timeout=5000)
+            except Exception as e:
+                self._note_failure(page, e, outcome)
+                if outcome is not None and outcome['failure'] not in (NETWORK, BROWSER, BLOCKED):
+                    # The search page loaded but did not lead to a place: an ordinary miss,
+                    # not a slow page, so the rate limiter must not back off for it
+                    outcome['failure'] = NOT_FOUND
+                    outcome.pop('signal', None)
+                return None
+            return await self.scrape_cafe_page(page, page.url, outcome)
+
+        except Exception as e:
+            print(f"      ✗ Search error: {e}")
+            self._note_failure(page, e, outcome, 'load')
+            return None
+
+    async def scrape_place(self, page, name, address, link=None, outcome=None):
+        """Go straight to a stored place link; fall back to the search flow if it does not load."""
+        if not self.metrics:
+            return await self._scrape_place(page, name, address, link, outcome)
+        timer = self.metrics.start_cafe(name, "full")
+        token = _cafe_timer.set(timer)
+        try:
+            data = await self._scrape_place(page, name, address, link, outcome)
+            outcome = outcome or {}
+            if data:
+                timer.set_outcome(DONE)
+            elif outcome.get('skip'):
+                timer.set_outcome(SKIPPED, outcome['skip'])
+            else:
+                timer.set_outcome(FAILED, outcome.get('failure') or NOT_FOUND)
+            return data
+        finally:
+            _cafe_timer.reset(token)
+            self.metrics.finish_cafe(timer)
+
+    async def _scrape_place(self, page, name, address, link=None, outcome=None):
+        if link and "/maps/place/" in link:
+            data = await self.scrape_cafe_page(page, link, outcome)
+            if data or (outcome and (outcome.get('skip') or outcome.get('signal') in BLOCK_SIGNALS)):
+                return data
+            print(f"      Direct link failed for {name} — falling back to search")
+            # The search reports its own outcome; a stale timeout would slow the limiter after a success
+            if outcome is not None:
+                outcome.pop('signal', None)
+                outcome.pop('failure', None)
+        return await self.scrape_direct(page, name, address, outcome)
+
+    async def scrape_task(self, name, address, outcome=None, link=None):
+        """Scrape one cafe in its own context, bounded by the concurrency semaphore."""
+        async with self._semaphore:
+            # Paced inside the semaphore so a backoff holds back the next cafes, not queued ones
+            await asyncio.sleep(self.limiter.reserve())
+            t0 = time.time()
+            blocker = ResourceBlocker() if self.block_resources else None
+            context = await self.new_context(blocker)
+            try:
+                page = await context.new_page()
+                return await self.scrape_place(page, name, address, link, outcome)
+            finally:
+                self.limiter.report((outcome or {}).get('signal'), time.time() - t0)
+                await context.close()
+                if blocker:
+                    print(f"      [fast mode] {name}: {blocker.page_summary()}")
+
+    async def save_record(self, data, region_file):
+        # Writes are serialized and pushed off the event loop
+        async with self._write_lock:
+            await asyncio.to_thread(self.writer.save_record, data, region_file)
+
+    async def _process(self, i, task, journal, counters, failures):
+        name = task.get('name')
+        address = task.get('address', '')
+        attempt = 1
+        while True:
+            print(f"[{i+1}] Processing: {name}" + (f" (attempt {attempt})" if attempt > 1 else ""))
+            outcome = {}
+            try:
+                data = await self.scrape_task(name, address, outcome, link=task.get('link'))
+            except Exception as e:
+                print(f"  ! Fatal error processing {name}: {e}")
+                data = None
+                outcome['failure'] = classify_failure(e, 'extract')
+            if data or outcome.get('skip'):
+                break
+            reason = outcome.get('failure') or NOT_FOUND
+            # Backoff happens outside the semaphore, so other cafes keep its slot busy
+            delay = failures.retry_delay(reason, attempt)
+            if delay is None:
+                failures.dead_letter(task, reason, attempt)
+                break
+            print(f"  ↻ {name}: {reason}, retry {attempt + 1} in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+        if data:
+            await self.save_record(data, self.determine_region_file(address))
+            counters['added'] += 1
+            journal.record(task_key(name, address), DONE)
+        elif outcome.get('skip'):
+            journal.record(task_key(name, address), SKIPPED, outcome['skip'])
+        else:
+            print(f"  ✗ Not found: {name}")
+            counters['failed'] += 1
+            journal.record(task_key(name, address), FAILED, reason)
+
+    async def run(self, headless=True, journal_path=None, retry_failed=False):
+        if not os.path.exists(self.input_file):
+            print(f"Input file {self.input_file} not found.")
+            return
+
+        with open(self.input_file, 'r', encoding='utf-8') as f:
+            tasks = json.load(f)
+
+        print(f"loaded {len(tasks)} cafes from list.")
+        journal = ScrapeJournal(journal_path or default_journal_path(self.input_file))
+        pending = [(i, task) for i, task in enumerate(tasks)
+                   if journal.should_run(task_key(task.get('name'), task.get('address', '')), retry_failed)]
+        print(f"{len(pending)} cafes to scrape after checking {journal.path}.")
+        self.writer.compact_stores()
+        await self.start_browser(headless=headless)
+
+        counters = {'added': 0, 'failed': 0}
+        failures = FailureTracker(dead_letter_path(journal.path))
+        started = time.time()
+        try:
+            await asyncio.gather(*(self._process(i, task, journal, counters, failures) for i, task in pending))
+        finally:
+            await self.close_browser()
+            self.writer.compact_stores()
+
+        elapsed = time.time() - started
+        print(f"\nDone. Added {counters['added']} cafes, {counters['failed']} failed "
+              f"in {elapsed/60:.1f} min ({len(pending) * 3600 / max(elapsed, 1e-6):.1f} cafes/hour).")
+        print(f"Failures: {failures.summary()}")
+        print(f"Adaptive waits: {self.wait_savings.summary()}")
+        print(f"Rate limiter: {self.limiter.summary()}")
+        # A full pass finished; the next run starts with only the failed entries (same rule as run_batch)
+        print(f"Archived journal to {journal.archive()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape cafes with the asyncio engine")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--input", default="consolidated_list.json")
+    parser.add_argument("--headful", action="store_true", help="show the browser window")
+    parser.add_argument("--network-images", action="store_true",
+                        help="collect gallery photos from network responses instead of the DOM")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE * 60,
+                        help="starting pace in cafes per minute; adapts to clean loads and block signals")
+    parser.add_argument("--parallel-chips", action="store_true",
+                        help="scan menu/food/drink gallery chips in sibling pages concurrently")
+    parser.add_argument("--fast", action="store_true",
+                        help="block fonts, map tiles, analytics and non-photo images")
+    parser.add_argument("--journal", help="checkpoint journal path (default: scrape_journal_<input>.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true", help="only rerun tasks the journal marks as failed")
+    parser.add_argument("--fresh", action="store_true", help="discard the journal and start over")
+    parser.add_argument("--metrics", help="append per-cafe phase timings to this JSONL file")
+    args = parser.parse_args()
+    if args.fresh:
+        discard_journal(args.journal or default_journal_path(args.input))
+    scraper = AsyncCafeScraper(args.input, concurrency=args.concurrency,
+                               capture_network_images=args.network_images, block_resources=args.fast,
+                               parallel_menu_chips=args.parallel_chips, rate=args.rate / 60,
+                               metrics=ScrapeMetrics(args.metrics) if args.metrics else None)
+    asyncio.run(scraper.run(headless=not args.headful, journal_path=args.journal, retry_failed=args.retry_failed))
@@ -0,0 +1,173 @@
+"""
+Global priority queue for batch re-scrapes.
+
+Instead of walking region files one by one, every stored cafe in every
+cafe_data_*.json is scored and the best ones are scheduled until the time
+budget is spent. The score blends:
+
+    staleness      days since scraped_at (or the last 'done' in the batch
+                   journals, current and archived); never scraped = 1
+    popularity     log-scaled reviews_count relative to the busiest cafe
+    incompleteness share of missing reviews, photos, menu, hours and phone
+
+and is divided by (1 + failures since the last success), so places that keep
+failing drift down instead of eating the night. The per-cafe duration used for
+the budget comes from a --metrics file (p50 per mode) when one is given.
+
+Usage:
+    python batch_scheduler.py --budget 360              # print tonight's queue
+    python batch_scraper.py --budget 360 [--delta]      # and scrape it
+"""
+import argparse
+import glob
+import json
+import math
+import os
+from datetime import datetime
+from scrape_journal import task_key, DONE, FAILED
+from scrape_metrics import load_events, percentile
+
+WEIGHT_STALENESS = 0.45
+WEIGHT_POPULARITY = 0.30
+WEIGHT_INCOMPLETE = 0.25
+# Age at which staleness saturates
+STALE_DAYS = 30
+# Cafes refreshed more recently than this are not scheduled at all
+MIN_AGE_DAYS = 1
+# Seconds per cafe when no metrics are available
+DEFAULT_SECONDS = {"full": 60.0, "delta": 20.0}
+
+
+def parse_count(count_str):
+    if not count_str or count_str == "N/A":
+        return 0
+    try:
+        # Handle cases like "2.942" or "1,2k" if they appear
+        clean_str = str(count_str).replace(".", "").replace(",", "").replace(" reviews", "").strip()
+        return int(clean_str)
+    except:
+        return 0
+
+
+def completeness(item):
+    menu = item.get('menu') if isinstance(item.get('menu'), dict) else {}
+    checks = [
+        len(item.get('customer_reviews') or []) >= 5,
+        len(item.get('photos') or []) > 50,
+        bool(menu.get('images')),
+        bool(item.get('opening_hours')),
+        item.get('phone') not in (None, "", "N/A"),
+    ]
+    return sum(checks) / len(checks)
+
+
+def _parse_ts(ts):
+    try:
+        return datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return None
+
+
+def journal_history(journal_path):
+    """{task key: {'last_done': datetime, 'failures': n}} from a journal and its archives."""
+    stem, ext = os.path.splitext(journal_path)
+    paths = sorted(set(glob.glob(journal_path) + glob.glob(f"{stem}_*{ext}") + glob.glob(f"{stem}.*{ext}")))
+    entries = []
+    # Failed entries are carried from an archive into the next journal: count each once
+    seen = set()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() in seen:
+                    continue
+                seen.add(line.strip())
+                try:
+                    entries.append(json.loads(line))
+                except Exception:
+                    continue
+    entries.sort(key=lambda e: e.get('ts', ''))
+
+    history = {}
+    for entry in entries:
+        h = history.setdefault(entry.get('key'), {'last_done': None, 'failures': 0})
+        if entry.get('status') == DONE:
+            h['last_done'] = _parse_ts(entry.get('ts'))
+            h['failures'] = 0
+        elif entry.get('status') == FAILED:
+            h['failures'] += 1
+    return history
+
+
+def seconds_per_cafe(metrics_path=None):
+    seconds = dict(DEFAULT_SECONDS)
+    if metrics_path and os.path.exists(metrics_path):
+        by_mode = {}
+        for event in load_events([metrics_path]):
+            by_mode.setdefault(event.get('mode'), []).append(event['total_s'])
+        for mode, values in by_mode.items():
+            if mode in seconds and values:
+                seconds[mode] = percentile(values, 50)
+    return seconds
+
+
+def score_cafes(files, history, now=None):
+    """[(score, filepath, item)] for every stored cafe, best first."""
+    now = now or datetime.now()
+    cafes = []
+    for filepath in files:
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                cafes.extend((filepath, item) for item in json.load(f))
+        except Exception as e:
+            print(f"Error loading {filepath}: {e}")
+    if not cafes:
+        return []
+
+    max_reviews = max(parse_count(item.get('reviews_count')) for _, item in cafes)
+    scored = []
+    for filepath, item in cafes:
+        h = history.get(task_key(item.get('name'), item.get('address', '')), {})
+        last = _parse_ts(item.get('scraped_at')) or h.get('last_done')
+        if last:
+            age_days = (now - last).total_seconds() / 86400
+            if age_days < MIN_AGE_DAYS:
+                continue
+            staleness = min(age_days / STALE_DAYS, 1.0)
+        else:
+            staleness = 1.0
+        popularity = math.log1p(parse_count(item.get('reviews_count'))) / math.log1p(max_reviews) if max_reviews else 0.0
+        incomplete = 1.0 - completeness(item)
+        score = (WEIGHT_STALENESS * staleness + WEIGHT_POPULARITY * popularity
+                 + WEIGHT_INCOMPLETE * incomplete) / (1 + h.get('failures', 0))
+        scored.append((score, filepath, item))
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return scored
+
+
+def build_schedule(files, journal_path, budget_minutes=None, delta=False, metrics_path=None):
+    """Highest-scoring cafes across all files that fit in budget_minutes (all of them without a budget)."""
+    scored = score_cafes(files, journal_history(journal_path))
+    per_cafe = seconds_per_cafe(metrics_path)["delta" if delta else "full"]
+    if budget_minutes is None:
+        return scored, per_cafe
+    fits = int(budget_minutes * 60 // per_cafe)
+    return scored[:fits], per_cafe
+
+
+if __name__ == "__main__":
+    from batch_scraper import region_files, BATCH_JOURNAL
+
+    parser = argparse.ArgumentParser(description="Rank cafes across all region files for re-scraping")
+    parser.add_argument("--budget", type=float, help="minutes of scraping to fill")
+    parser.add_argument("--delta", action="store_true", help="budget with delta-refresh durations")
+    parser.add_argument("--journal", default=BATCH_JOURNAL)
+    parser.add_argument("--metrics", help="scrape_metrics events used to estimate time per cafe")
+    parser.add_argument("--top", type=int, default=30, help="rows to print")
+    args = parser.parse_args()
+
+    schedule, per_cafe = build_schedule(region_files(), args.journal, args.budget, args.delta, args.metrics)
+    print(f"{len(schedule)} cafes scheduled at ~{per_cafe:.0f}s each "
+          f"({len(schedule) * per_cafe / 60:.0f} min).")
+    for score, filepath, item in schedule[:args.top]:
+        print(f"  {score:.3f}  {item.get('name')}  [{filepath}]  "
+              f"reviews={item.get('reviews_count')} complete={completeness(item):.0%}")
@@ -1,18 +1,19 @@
+import argparse
 import json
 import os
 import glob
 import time
+import zlib
 from scraper import CafeScraper
+from record_store import RecordStore
+from scrape_metrics import ScrapeMetrics
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_RATE
+from browser_lifecycle import BrowserLifecycle, add_lifecycle_arguments, lifecycle_options
+from scrape_journal import ScrapeJournal, task_key, discard_journal, FAILED
+from batch_scheduler import parse_count, build_schedule
+from failure_policy import FailureTracker, RetryQueue, classify_failure, dead_letter_path
 
-def parse_count(count_str):
-    if not count_str or count_str == "N/A":
-        return 0
-    try:
-        # Handle cases like "2.942" or "1,2k" if they appear
-        clean_str = count_str.replace(".", "").replace(",", "").replace(" reviews", "").strip()
-        return int(clean_str)
-    except:
-        return 0
+BATCH_JOURNAL = "batch_journal.jsonl"
 
 def get_needs_update(item):
     """
@@ -27,70 +28,205 @@ def get_needs_update(item):
         return False
     return True
 
-def run_batch():
+def region_files():
     files = glob.glob("cafe_data_*.json")
     # Exclusion list for test files
-    files = [f for f in files if "test_" not in f]
+    return [f for f in files if "test_" not in f]
+
+def in_shard(item, shard_index, shard_count):
+    """Stable hash split (same in every process, unlike hash()) of a file's cafes."""
+    key = task_key(item.get('name'), item.get('address', ''))
+    return zlib.crc32(key.encode('utf-8')) % shard_count == shard_index
+
+def update_item(scraper, store, item, delta=False, lifecycle=None, limiter=None):
+    """Re-scrape one stored cafe and log the fresh record to store. Returns (status, reason)."""
+    name = item.get('name')
+    address = item.get('address', '')
+    fresh_data = None
+    if limiter:
+        limiter.acquire()
+    t0 = time.time()
+    
+    try:
+        # Use scraper logic to get fresh HD data, straight from the stored place link when present
+        if delta:
+            scrape, args, kwargs = scraper.scrape_delta, (item,), {}
+        else:
+            # No stored record here: the full re-scrape exists to scroll the whole gallery again,
+            # the incremental scan would stop at the first screen of known photos
+            scrape, args, kwargs = scraper.scrape_place, (name, address, item.get('link')), {}
+        if lifecycle:
+            fresh_data = lifecycle.scrape(scrape, *args, **kwargs)
+        else:
+            fresh_data = scrape(*args, **kwargs)
+        
+        if fresh_data:
+            # Log after EVERY success to prevent data loss; compacted at the end of the file
+            store.append(fresh_data, replace_name=name)
+            print(f"  ✓ Successfully updated and logged {name}")
+        else:
+            print(f"  ✗ Scraper returned no data for {name}")
+            
+    except Exception as e:
+        print(f"  ! Fatal error processing {name}: {e}")
+        # Optional: break or continue. Continue is safer for batch.
+        if limiter:
+            limiter.report(scraper.last_signal, time.time() - t0)
+        return FAILED, classify_failure(e, 'extract')
+    if limiter:
+        limiter.report(scraper.last_signal, time.time() - t0)
+    return scraper.outcome_status(fresh_data)
+
+def scrape_queue(scraper, entries, stores, journal, failures, retry_failed=False, delta=False, lifecycle=None,
+                 limiter=None, on_result=None, deadline=None):
+    """
+    Update (label, filepath, item) entries in order. Transient failures are retried after
+    their backoff (failure_policy); only final outcomes are journaled. Stops at deadline.
+    """
+    entries = [e for e in entries
+               if journal.should_run(task_key(e[2].get('name'), e[2].get('address', '')), retry_failed)]
+    pending = RetryQueue(entries)
+    done = 0
+    while True:
+        if deadline and time.time() >= deadline:
+            print(f"\nTime budget used up after {done} cafes ({len(pending)} left).")
+            break
+        next_item = pending.next()
+        if next_item is None:
+            break
+        entry, attempt = next_item
+        label, filepath, item = entry
+        print(f"\n{label} Updating Rich Data for: {item.get('name')}" + (f" (attempt {attempt})" if attempt > 1 else ""))
+        status, reason = update_item(scraper, stores[filepath], item, delta, lifecycle, limiter)
+        if status == FAILED and failures.retry_or_dead_letter(pending, entry, item, reason, attempt):
+            continue
+        journal.record(task_key(item.get('name'), item.get('address', '')), status, reason, file=filepath)
+        done += 1
+        if on_result:
+            on_result(status)
+
+def process_file(scraper, filepath, journal, retry_failed=False, delta=False, shard=None, on_result=None,
+                 lifecycle=None, limiter=None, failures=None):
+    """
+    Re-scrape one region file. shard=(index, count) limits the run to that hash shard
+    and logs to a shard-owned record log, which the caller compacts once every shard
+    is done. on_result(status) is called after each cafe. lifecycle, a BrowserLifecycle
+    for the scraper, recycles and restarts the browser between cafes; limiter, an
+    AdaptiveRateLimiter, paces them; failures, a FailureTracker, decides retries
+    (one writing next to the journal is made if not given).
+    """
+    limiter = limiter or AdaptiveRateLimiter()
+    own_failures = failures is None
+    failures = failures or FailureTracker(dead_letter_path(journal.path))
+    if shard:
+        store = RecordStore(filepath, shard=f"s{shard[0] + 1}of{shard[1]}")
+    else:
+        store = RecordStore(filepath)
+        # Fold in anything a crashed run left in the log
+        store.compact()
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Error loading {filepath}: {e}")
+        return False
+
+    # Filter for those needing updates and sort by popularity (reviews_count)
+    queue = list(data) if delta else [item for item in data if get_needs_update(item)]
+    if shard:
+        queue = [item for item in queue if in_shard(item, *shard)]
+    queue.sort(key=lambda x: parse_count(x.get('reviews_count', '0')), reverse=True)
+    
+    print(f"Found {len(queue)} cafes needing rich data updates out of {len(data)} total.")
     
+    # We'll process them one by one
+    entries = [(f"[{i+1}/{len(queue)}]", filepath, item) for i, item in enumerate(queue)]
+    scrape_queue(scraper, entries, {filepath: store}, journal, failures, retry_failed, delta,
+                 lifecycle, limiter, on_result)
+
+    if not shard:
+        store.compact()
+    if own_failures:
+        print(f"Failures: {failures.summary()}")
+    return True
+
+def run_schedule(scraper, files, journal, budget_minutes, retry_failed=False, delta=False, metrics_path=None,
+                 lifecycle=None, limiter=None, failures=None):
+    """Scrape the global priority queue across files until budget_minutes of wall clock are used."""
+    stores = {filepath: RecordStore(filepath) for filepath in files}
+    for store in stores.values():
+        # Score against the latest data, including anything a crashed run left in the log
+        store.compact()
+    schedule, per_cafe = build_schedule(files, journal.path, budget_minutes, delta, metrics_path)
+    print(f"Scheduled {len(schedule)} cafes for {budget_minutes:.0f} min (~{per_cafe:.0f}s each).")
+
+    failures = failures or FailureTracker(dead_letter_path(journal.path))
+    entries = [(f"[{i+1}/{len(schedule)}] ({score:.2f}, {filepath})", filepath, item)
+               for i, (score, filepath, item) in enumerate(schedule)]
+    try:
+        scrape_queue(scraper, entries, stores, journal, failures, retry_failed, delta, lifecycle, limiter,
+                     deadline=time.time() + budget_minutes * 60)
+    finally:
+        for store in stores.values():
+            store.compact()
+
+def run_batch(block_resources=False, journal_path=BATCH_JOURNAL, retry_failed=False, delta=False,
+              metrics_path=None, rate=DEFAULT_RATE, budget_minutes=None, **lifecycle_options):
+    """
+    delta=True refreshes every cafe but only re-runs the extractors whose inputs changed
+    (see CafeScraper.scrape_delta); otherwise only cafes picked by get_needs_update get
+    a full re-scrape. See shard_runner.py for the multi-process version.
+    With budget_minutes, cafes from all files are taken in batch_scheduler priority order
+    instead, until the budget is used up.
+    """
+    files = region_files()
     print(f"Found {len(files)} regional files to process.")
     
-    scraper = CafeScraper()
+    journal = ScrapeJournal(journal_path)
+    scraper = CafeScraper(metrics=ScrapeMetrics(metrics_path) if metrics_path else None)
     # Using headless=True for background batch run as planned
-    scraper.start_browser(headless=True)
+    scraper.start_browser(headless=True, block_resources=block_resources)
+    lifecycle = BrowserLifecycle(scraper, **lifecycle_options)
+    limiter = AdaptiveRateLimiter(rate)
+    failures = FailureTracker(dead_letter_path(journal_path))
     
-    for filepath in files:
-        print(f"\n--- Processing File: {filepath} ---")
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except Exception as e:
-            print(f"Error loading {filepath}: {e}")
-            continue
-
-        # Filter for those needing updates and sort by popularity (reviews_count)
-        queue = [item for item in data if get_needs_update(item)]
-        queue.sort(key=lambda x: parse_count(x.get('reviews_count', '0')), reverse=True)
-        
-        print(f"Found {len(queue)} cafes needing rich data updates out of {len(data)} total.")
-        
-        # We'll process them one by one
-        for i, item in enumerate(queue):
-            name = item.get('name')
-            address = item.get('address', '')
-            print(f"\n[{i+1}/{len(queue)}] Updating Rich Data for: {name}")
-            
-            try:
-                # Use scraper logic to get fresh HD data
-                fresh_data = scraper.scrape_direct(name, address)
-                
-                if fresh_data:
-                    # Update in the original list
-                    # Find the index in the original 'data' list
-                    idx = next((index for index, d in enumerate(data) if d.get('name') == name), None)
-                    if idx is not None:
-                        # Ensure we don't lose existing fields if for some reason scrape_direct misses something
-                        # but usually fresh_data is more complete
-                        data[idx] = fresh_data
-                        
-                        # Save incrementally after EVERY success to prevent data loss
-                        with open(filepath, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, indent=4, ensure_ascii=False)
-                        print(f"  ✓ Successfully updated and saved {name}")
-                    else:
-                        print(f"  ? Could not find {name} in original list to update")
-                else:
-                    print(f"  ✗ Scraper returned no data for {name}")
-                    
-            except Exception as e:
-                print(f"  ! Fatal error processing {name}: {e}")
-                # Optional: break or continue. Continue is safer for batch.
-                continue
-            
-            # Subtle sleep to prevent rate limiting
-            time.sleep(2)
+    if budget_minutes:
+        run_schedule(scraper, files, journal, budget_minutes, retry_failed, delta, metrics_path,
+                     lifecycle=lifecycle, limiter=limiter, failures=failures)
+    else:
+        for filepath in files:
+            print(f"\n--- Processing File: {filepath} ---")
+            process_file(scraper, filepath, journal, retry_failed, delta, lifecycle=lifecycle, limiter=limiter,
+                         failures=failures)
 
+    lifecycle.close()
     scraper.close_browser()
+    print(f"Browser lifecycle: {lifecycle.summary()}")
+    print(f"Rate limiter: {limiter.summary()}")
+    print(f"Failures: {failures.summary()}")
+    print(f"Journal: {journal.counts()}")
+    # A full cycle finished; the next one starts with only the failed entries, for --retry-failed
+    print(f"Archived journal to {journal.archive()}")
     print("\nBatch scraping cycle complete!")
 
 if __name__ == "__main__":
-    run_batch()
+    parser = argparse.ArgumentParser(description="Re-scrape rich data for cafes in the region files")
+    parser.add_argument("--fast", action="store_true",
+                        help="block fonts, map tiles, analytics and non-photo images")
+    parser.add_argument("--delta", action="store_true",
+                        help="refresh all cafes, re-running only sections whose counts changed")
+    parser.add_argument("--journal", default=BATCH_JOURNAL, help="checkpoint journal for resuming a cycle")
+    parser.add_argument("--retry-failed", action="store_true", help="only rerun tasks the journal marks as failed")
+    parser.add_argument("--fresh", action="store_true", help="discard the journal and start the cycle over")
+    parser.add_argument("--metrics", help="append per-cafe phase timings to this JSONL file")
+    parser.add_argument("--budget", type=float,
+                        help="minutes to spend; scrape cafes from all files in priority order (batch_scheduler.py)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE * 60,
+                        help="starting pace in cafes per minute; adapts to clean loads and block signals")
+    add_lifecycle_arguments(parser)
+    args = parser.parse_args()
+    if args.fresh:
+        discard_journal(args.journal)
+    run_batch(block_resources=args.fast, journal_path=args.journal, retry_failed=args.retry_failed,
+              delta=args.delta, metrics_path=args.metrics, rate=args.rate / 60,
+              budget_minutes=args.budget, **lifecycle_options(args))
@@ -0,0 +1,235 @@
+"""
+Keeps long scrape runs on a flat memory profile.
+
+BrowserLifecycle wraps each scrape call of a CafeScraper:
+- every `recycle_every` cafes the browser context (and its page) is replaced,
+  which drops the renderer processes and everything the gallery pages cached;
+- when the browser's resident memory crosses `max_rss_mb` the whole browser is
+  restarted;
+- a watchdog thread kills the browser when one cafe takes longer than
+  `task_timeout` seconds. The blocked Playwright call then fails, the browser is
+  restarted and the cafe is tried once more, so the run's task list carries on.
+
+RSS and the watchdog need the browser to be a child of this process (psutil when
+installed, /proc otherwise). When attached over CDP (scraper_pool) only the
+count-based context recycling applies.
+"""
+import os
+import signal
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_RECYCLE_EVERY = 40
+DEFAULT_MAX_RSS_MB = 1500
+DEFAULT_TASK_TIMEOUT = 300
+
+BROWSER_PROCESS_NAMES = ("msedge", "chrome", "chromium", "headless_shell")
+
+
+def _is_browser(name):
+    name = (name or "").lower()
+    return any(b in name for b in BROWSER_PROCESS_NAMES)
+
+
+def _proc_children_map():
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", 'r') as f:
+                stat = f.read()
+            # comm may contain spaces; ppid is the 2nd field after the closing paren
+            ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        except Exception:
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def browser_processes():
+    """(pid, rss_bytes) of browser processes descended from this one, or None if unknown."""
+    if psutil:
+        found = []
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if _is_browser(child.name()):
+                    found.append((child.pid, child.memory_info().rss))
+            except psutil.Error:
+                continue
+        return found
+    if not os.path.isdir("/proc"):
+        return None
+
+    children = _proc_children_map()
+    found = []
+    stack = list(children.get(os.getpid(), []))
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/comm", 'r') as f:
+                name = f.read().strip()
+            if not _is_browser(name):
+                continue
+            rss = 0
+            with open(f"/proc/{pid}/status", 'r') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss = int(line.split()[1]) * 1024
+                        break
+            found.append((pid, rss))
+        except Exception:
+            continue
+    return found
+
+
+def browser_rss_mb():
+    procs = browser_processes()
+    if procs is None:
+        return None
+    return sum(rss for _, rss in procs) / (1024 * 1024)
+
+
+def kill_browser_processes():
+    procs = browser_processes() or []
+    for pid, _ in procs:
+        try:
+            if psutil:
+                psutil.Process(pid).kill()
+            else:
+                os.kill(pid, signal.SIGKILL)
+        except Exception:
+            pass
+    return len(procs)
+
+
+class Watchdog:
+    """Kills the local browser if a task is still running after its deadline."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.fired = False
+        self._deadline = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def arm(self):
+        with self._lock:
+            self.fired = False
+            self._deadline = time.time() + self.timeout
+
+    def disarm(self):
+        with self._lock:
+            self._deadline = None
+
+    def _watch(self):
+        while not self._stop.wait(1):
+            with self._lock:
+                overdue = self._deadline is not None and time.time() > self._deadline
+                if overdue:
+                    self._deadline = None
+                    self.fired = True
+            if overdue:
+                killed = kill_browser_processes()
+                print(f"  ! Watchdog: task exceeded {self.timeout}s, killed {killed} browser processes")
+
+    def stop(self):
+        self._stop.set()
+
+
+class BrowserLifecycle:
+    def __init__(self, scraper, recycle_every=DEFAULT_RECYCLE_EVERY, max_rss_mb=DEFAULT_MAX_RSS_MB,
+                 task_timeout=DEFAULT_TASK_TIMEOUT):
+        """A falsy recycle_every / max_rss_mb / task_timeout turns that check off."""
+        self.scraper = scraper
+        self.recycle_every = recycle_every
+        self.max_rss_mb = max_rss_mb
+        # Killing processes is only safe when the browser is ours alone
+        self.owns_browser = not scraper.launch_options.get('cdp_endpoint')
+        self.watchdog = Watchdog(task_timeout) if task_timeout and self.owns_browser else None
+        self.since_recycle = 0
+        self.recycles = 0
+        self.restarts = 0
+        self.hangs = 0
+        self.peak_rss_mb = 0.0
+
+    def scrape(self, fn, *args, **kwargs):
+        """
+        Run one scrape call (e.g. scraper.scrape_place). If the browser hung or died
+        during it, restart the browser and run it once more.
+        """
+        for attempt in range(2):
+            if self.watchdog:
+                self.watchdog.arm()
+            try:
+                result = fn(*args, **kwargs)
+                error = None
+            except Exception as e:
+                result, error = None, e
+            finally:
+                if self.watchdog:
+                    self.watchdog.disarm()
+
+            hung = bool(self.watchdog and self.watchdog.fired)
+            if not hung and self.scraper.browser_alive():
+                if error:
+                    raise error
+                self._maintain()
+                return result
+
+            self.hangs += hung
+            print(f"  ! Browser {'hung' if hung else 'died'} — restarting"
+                  f"{' and retrying' if attempt == 0 else ''}")
+            self._restart()
+        self._maintain()
+        return None
+
+    def _restart(self):
+        self.scraper.restart_browser()
+        self.restarts += 1
+        self.since_recycle = 0
+
+    def _maintain(self):
+        self.since_recycle += 1
+        rss = browser_rss_mb() if self.max_rss_mb and self.owns_browser else None
+        if rss is not None:
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            if rss > self.max_rss_mb:
+                print(f"  [lifecycle] browser RSS {rss:.0f} MB > {self.max_rss_mb} MB — restarting browser")
+                self._restart()
+                return
+        if self.recycle_every and self.since_recycle >= self.recycle_every:
+            print(f"  [lifecycle] {self.since_recycle} cafes on this context — recycling")
+            self.scraper.recycle_context()
+            self.recycles += 1
+            self.since_recycle = 0
+
+    def summary(self):
+        peak = f", peak RSS {self.peak_rss_mb:.0f} MB" if self.peak_rss_mb else ""
+        return f"{self.recycles} context recycles, {self.restarts} browser restarts, {self.hangs} hung tasks{peak}"
+
+    def close(self):
+        if self.watchdog:
+            self.watchdog.stop()
+
+
+def add_lifecycle_arguments(parser):
+    parser.add_argument("--recycle-every", type=int, default=DEFAULT_RECYCLE_EVERY,
+                        help="replace the browser context after this many cafes (0 = never)")
+    parser.add_argument("--max-rss-mb", type=int, default=DEFAULT_MAX_RSS_MB,
+                        help="restart the browser when its memory exceeds this (0 = no limit)")
+    parser.add_argument("--task-timeout", type=int, default=DEFAULT_TASK_TIMEOUT,
+                        help="seconds before a stuck cafe gets the browser killed and restarted (0 = off)")
+
+
+def lifecycle_options(args):
+    return {'recycle_every': args.recycle_every, 'max_rss_mb': args.max_rss_mb,
+            'task_timeout': args.task_timeout}
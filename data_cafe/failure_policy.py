@@ -0,0 +1,165 @@
+"""
+Failure taxonomy and retry policy for scrape runs.
+
+CafeScraper records why a cafe failed in last_failure, one of the classes
+below. Each class has a retry policy: transient ones (timeouts, network
+errors, a crashed browser) are requeued with exponential backoff and tried
+again later in the same run; permanent ones (the search finds no place) go
+straight to the dead-letter list. A task that runs out of attempts is also
+dead-lettered: one JSON line per task in dead_letters_<journal>.jsonl, and
+the journal keeps it as failed for --retry-failed.
+"""
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+TIMEOUT = "timeout"              # page load timed out
+MISSING_PLACE = "missing_place"  # page loaded but no place header (h1.DUwDvf)
+NOT_FOUND = "not_found"          # search returned no place
+NETWORK = "network"              # net::ERR_* from the browser
+BLOCKED = "blocked"              # captcha / consent interstitial
+BROWSER = "browser"              # page, context or browser went away
+PARSE = "parse"                  # place loaded, an extractor blew up
+UNKNOWN = "unknown"
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts, base_delay=0.0, max_delay=900.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Backoff before attempt number `attempt + 1`."""
+        return min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+
+
+RETRY_POLICIES = {
+    TIMEOUT: RetryPolicy(3, 20),
+    MISSING_PLACE: RetryPolicy(2, 10),
+    NOT_FOUND: RetryPolicy(1),
+    NETWORK: RetryPolicy(3, 60),
+    BLOCKED: RetryPolicy(2, 300),
+    BROWSER: RetryPolicy(2, 0),
+    PARSE: RetryPolicy(2, 0),
+    UNKNOWN: RetryPolicy(2, 30),
+}
+
+BROWSER_GONE_MARKERS = ("Target closed", "Target page, context or browser has been closed",
+                        "Browser has been closed", "Connection closed", "browser has disconnected")
+
+
+def classify_failure(error=None, stage=None, blocked=False):
+    """
+    Failure class for an exception raised while scraping.
+    stage: 'load' (navigation), 'place' (waiting for the place header) or 'extract'.
+    """
+    if blocked:
+        return BLOCKED
+    message = str(error or "")
+    if "net::ERR_" in message:
+        return NETWORK
+    if any(marker in message for marker in BROWSER_GONE_MARKERS):
+        return BROWSER
+    if type(error).__name__ == "TimeoutError":
+        return MISSING_PLACE if stage == 'place' else TIMEOUT
+    if stage == 'extract':
+        return PARSE
+    return UNKNOWN
+
+
+def dead_letter_path(journal_path):
+    folder, name = os.path.split(journal_path)
+    return os.path.join(folder, f"dead_letters_{name}")
+
+
+class FailureTracker:
+    """Counts failures by class, decides retries and writes the dead-letter list."""
+
+    def __init__(self, dead_letter_file, policies=None):
+        self.dead_letter_file = dead_letter_file
+        self.policies = policies or RETRY_POLICIES
+        self.counts = {}
+        self.retried = 0
+        self.dead = 0
+        self._lock = threading.Lock()
+
+    def retry_delay(self, failure_class, attempt):
+        """Seconds to wait before retrying, or None when the task should be dead-lettered."""
+        with self._lock:
+            self.counts[failure_class] = self.counts.get(failure_class, 0) + 1
+            policy = self.policies.get(failure_class, self.policies[UNKNOWN])
+            if attempt >= policy.max_attempts:
+                return None
+            self.retried += 1
+            return policy.delay(attempt)
+
+    def retry_or_dead_letter(self, retry_queue, payload, task, failure_class, attempt):
+        """After a failed attempt: requeue payload with backoff (True) or dead-letter the task (False)."""
+        delay = self.retry_delay(failure_class, attempt)
+        if delay is None:
+            self.dead_letter(task, failure_class, attempt)
+            return False
+        print(f"  ↻ {task.get('name')}: {failure_class}, retry {attempt + 1} in {delay:.0f}s")
+        retry_queue.requeue(payload, attempt + 1, delay)
+        return True
+
+    def dead_letter(self, task, failure_class, attempts):
+        entry = {
+            "name": task.get('name'),
+            "address": task.get('address', ''),
+            "link": task.get('link'),
+            "class": failure_class,
+            "attempts": attempts,
+            "ts": datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._lock:
+            self.dead += 1
+            with open(self.dead_letter_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"  ☠ Dead-lettered {task.get('name')} ({failure_class} after {attempts} attempts)")
+
+    def summary(self):
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items())) or "none"
+        return f"failures by class: {counts}; {self.retried} retries, {self.dead} dead-lettered"
+
+
+class RetryQueue:
+    """
+    Fresh tasks in order plus retries that become due after their backoff.
+    Items are (payload, attempt); attempt counts from 1. Thread-safe.
+    """
+
+    def __init__(self, payloads=()):
+        self.fresh = deque((p, 1) for p in payloads)
+        self.delayed = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def requeue(self, payload, attempt, delay):
+        with self._lock:
+            heapq.heappush(self.delayed, (time.time() + delay, next(self._seq), payload, attempt))
+
+    def next(self):
+        """Next due item, waiting for a delayed retry if nothing else is left; None when empty."""
+        while True:
+            with self._lock:
+                now = time.time()
+                if self.delayed and self.delayed[0][0] <= now:
+                    _, _, payload, attempt = heapq.heappop(self.delayed)
+                    return payload, attempt
+                if self.fresh:
+                    return self.fresh.popleft()
+                if not self.delayed:
+                    return None
+                wait = self.delayed[0][0] - now
+            time.sleep(min(wait, 5))
+
+    def __len__(self):
+        with self._lock:
+            return len(self.fresh) + len(self.delayed)
@@ -0,0 +1,99 @@
+"""
+Coordinates and nearby lookups for the API.
+
+Every record's Maps link carries its position (@lat,lng or !3d..!4d..).
+GeoIndex buckets the cafes into a grid of GRID_DEGREES cells once in
+main.load_data; a nearby query reads only the cells that overlap its radius
+and ranks those candidates with a vectorized haversine.
+"""
+import math
+import re
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+# ~1.1 km cells at Yogyakarta's latitude
+GRID_DEGREES = 0.01
+
+
+def extract_coords_from_link(link: str) -> tuple[float, float] | None:
+    """Extract latitude and longitude from Google Maps link."""
+    if not link:
+        return None
+
+    # Pattern 1: @lat,lng,zoom in URL
+    match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', link)
+    if match:
+        return float(match.group(1)), float(match.group(2))
+
+    # Pattern 2: !3d{lat}!4d{lng} in URL
+    match = re.search(r'!3d(-?\d+\.\d+)!4d(-?\d+\.\d+)', link)
+    if match:
+        return float(match.group(1)), float(match.group(2))
+
+    # Pattern 3: ll={lat},{lng} in query params
+    match = re.search(r'll=(-?\d+\.\d+),(-?\d+\.\d+)', link)
+    if match:
+        return float(match.group(1)), float(match.group(2))
+
+    return None
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distance in km from (lat, lng) to every point of the lats/lngs arrays."""
+    lat, lng = math.radians(lat), math.radians(lng)
+    lats, lngs = np.radians(lats), np.radians(lngs)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    def __init__(self, cafes, cell=GRID_DEGREES):
+        self.cafes = cafes
+        self.cell = cell
+        ids, lats, lngs = [], [], []
+        for i, cafe in enumerate(cafes):
+            coords = extract_coords_from_link(cafe.get('link'))
+            if coords:
+                ids.append(i)
+                lats.append(coords[0])
+                lngs.append(coords[1])
+        self.ids = np.array(ids, dtype=np.int64)
+        self.lats = np.array(lats, dtype=np.float64)
+        self.lngs = np.array(lngs, dtype=np.float64)
+
+        buckets = {}
+        for row, key in enumerate(zip(self._cells(self.lats), self._cells(self.lngs))):
+            buckets.setdefault(key, []).append(row)
+        self.grid = {key: np.array(rows, dtype=np.int64) for key, rows in buckets.items()}
+
+    def _cells(self, degrees):
+        return np.floor(np.asarray(degrees) / self.cell).astype(np.int64).tolist()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearby(self, lat, lng, radius_km, limit=20):
+        """[(cafe, distance_km)] within radius_km, nearest first."""
+        lat_span = radius_km / KM_PER_DEGREE
+        lng_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        lat_cells = range(math.floor((lat - lat_span) / self.cell), math.floor((lat + lat_span) / self.cell) + 1)
+        lng_cells = range(math.floor((lng - lng_span) / self.cell), math.floor((lng + lng_span) / self.cell) + 1)
+        if len(lat_cells) * len(lng_cells) > len(self.grid):
+            # Radius covers more cells than are occupied: every cafe is a candidate
+            rows = np.arange(len(self.ids))
+        else:
+            hits = [self.grid[key] for key in ((i, j) for i in lat_cells for j in lng_cells) if key in self.grid]
+            if not hits:
+                return []
+            rows = np.concatenate(hits)
+
+        distances = haversine_km(lat, lng, self.lats[rows], self.lngs[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        if len(rows) > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            rows, distances = rows[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return [(self.cafes[self.ids[r]], float(d)) for r, d in zip(rows[order], distances[order])]
@@ -0,0 +1,109 @@
+"""
+Weekly opening-hours bitmaps for the API.
+
+opening_hours is stored as the text rows Maps shows, in Indonesian or English:
+
+    "Senin08.00–23.00", "Sabtu08.00–12.0013.00–22.00", "MingguTutup",
+    "Monday \t 9.00 am–10.00 pm \t ", "Tuesday12.00–2.00 am", "FridayOpen 24 hours"
+
+HoursIndex compiles every cafe once into 7 × 96 quarter-hour slots (Monday
+first, Asia/Jakarta time), stored as one row per cafe of a (cafes, 672) bool
+matrix. "Open at t" is then a single column of that matrix.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+# Asia/Jakarta (WIB) has no DST; a fixed offset avoids needing tzdata on Windows
+JAKARTA = timezone(timedelta(hours=7), "WIB")
+
+DAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "senin": 0, "selasa": 1, "rabu": 2, "kamis": 3, "jumat": 4, "sabtu": 5, "minggu": 6,
+}
+DAY_RE = re.compile(r"^\s*(" + "|".join(DAYS) + r")", re.IGNORECASE)
+TIME = r"(\d{1,2})[.:](\d{2})(?:\s*([ap]m))?"
+RANGE_RE = re.compile(TIME + r"\s*[–-]\s*" + TIME, re.IGNORECASE)
+ALL_DAY_RE = re.compile(r"open 24 hours|buka 24 jam", re.IGNORECASE)
+CLOSED_RE = re.compile(r"closed|tutup", re.IGNORECASE)
+
+
+def _minutes(hour, minute, suffix):
+    hour, minute = int(hour), int(minute)
+    if suffix:
+        hour = hour % 12 + (12 if suffix.lower() == "pm" else 0)
+    return hour * 60 + minute
+
+
+def parse_hours_row(row):
+    """(day, [(open_minute, close_minute), ...]) for one row, or None if it can't be read."""
+    # Narrow no-break space before am/pm, and the trailing icon glyph Maps appends
+    text = (row or "").replace("\u202f", " ").replace("\ue14d", "")
+    day = DAY_RE.match(text)
+    if not day:
+        return None
+    rest = text[day.end():]
+    if ALL_DAY_RE.search(rest):
+        return DAYS[day.group(1).lower()], [(0, 24 * 60)]
+    ranges = []
+    for h1, m1, s1, h2, m2, s2 in RANGE_RE.findall(rest):
+        # "9.00–11.00 pm": the opening time shares the closing time's suffix
+        ranges.append((_minutes(h1, m1, s1 or s2), _minutes(h2, m2, s2)))
+    if not ranges and not CLOSED_RE.search(rest):
+        return None
+    return DAYS[day.group(1).lower()], ranges
+
+
+def compile_week(opening_hours):
+    """Bool array of WEEK_SLOTS for a cafe's rows, or None when no row parses."""
+    week = np.zeros(WEEK_SLOTS, dtype=bool)
+    parsed = False
+    for row in opening_hours or []:
+        result = parse_hours_row(row)
+        if result is None:
+            continue
+        parsed = True
+        day, ranges = result
+        for start, end in ranges:
+            if end <= start:
+                # Closes after midnight (or "00.00–00.00"): runs into the next day
+                end += 24 * 60
+            first = day * SLOTS_PER_DAY + -(-start // SLOT_MINUTES)
+            last = day * SLOTS_PER_DAY + -(-end // SLOT_MINUTES)
+            # Sunday night spills over into Monday morning
+            week[np.arange(first, last) % WEEK_SLOTS] = True
+    return week if parsed else None
+
+
+def week_slot(at=None):
+    """Slot of the week for a datetime (naive means Jakarta time); now when at is None."""
+    if at is None:
+        at = datetime.now(JAKARTA)
+    elif at.tzinfo is None:
+        at = at.replace(tzinfo=JAKARTA)
+    at = at.astimezone(JAKARTA)
+    return at.weekday() * SLOTS_PER_DAY + (at.hour * 60 + at.minute) // SLOT_MINUTES
+
+
+class HoursIndex:
+    def __init__(self, cafes):
+        self.cafes = cafes
+        # Fortran order keeps each slot's column contiguous for the open-at lookup
+        self.slots = np.zeros((len(cafes), WEEK_SLOTS), dtype=bool, order='F')
+        self.known = np.zeros(len(cafes), dtype=bool)
+        for i, cafe in enumerate(cafes):
+            week = compile_week(cafe.get('opening_hours'))
+            if week is not None:
+                self.slots[i] = week
+                self.known[i] = True
+
+    def open_mask(self, at=None):
+        """Bool per cafe: open at `at`. Cafes without readable hours count as closed."""
+        return self.slots[:, week_slot(at)]
+
+    def open_at(self, at=None, skip=0, limit=100):
+        return [self.cafes[i] for i in np.flatnonzero(self.open_mask(at))[skip:skip + limit]]
@@ -1,10 +1,18 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional, Dict
+from datetime import datetime
 import json
 import os
 import re
+import threading
+import time
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from search_index import SearchIndex
+from geo import GeoIndex
+from hours_index import HoursIndex, week_slot
+from response_cache import ResponseCache, dataset_version
 
 load_dotenv()
 
@@ -13,6 +21,16 @@ app = FastAPI(title="Yogyakarta Cafe API", description="API for accessing cafe d
 # Data Storage
 CAFE_DATA: Dict[str, List[dict]] = {}
 ALL_CAFES: List[dict] = []
+SEARCH_INDEX: SearchIndex = SearchIndex([])
+GEO_INDEX: GeoIndex = GeoIndex([])
+HOURS_INDEX: HoursIndex = HoursIndex([])
+# Where each region's cafes sit in ALL_CAFES (row order of the indexes)
+REGION_ROWS: Dict[str, slice] = {}
+RESPONSE_CACHE = ResponseCache()
+# How often a request checks the region files for changes (a scrape or compaction rewrote them)
+RELOAD_CHECK_SECONDS = 5.0
+_reload_lock = threading.Lock()
+_last_reload_check = 0.0
 
 REGIONS = {
     "sleman": "cafe_data_Sleman.json",
@@ -23,9 +41,12 @@ REGIONS = {
 }
 
 def load_data():
-    """Load data from JSON files on startup"""
-    global CAFE_DATA, ALL_CAFES
-    ALL_CAFES = []
+    """Load data from JSON files on startup, and again whenever they change on disk"""
+    global CAFE_DATA, ALL_CAFES, REGION_ROWS, SEARCH_INDEX, GEO_INDEX, HOURS_INDEX
+    # Taken before reading, so a file rewritten mid-load is picked up by the next check
+    version = dataset_version(REGIONS.values())
+    # Built aside and swapped in at the end: requests keep using the old data and indexes meanwhile
+    cafe_data, all_cafes, region_rows = {}, [], {}
     
     for region_key, filename in REGIONS.items():
         if os.path.exists(filename):
@@ -37,18 +58,51 @@ def load_data():
                         entry['region_id'] = region_key
                         entry['region_name'] = region_key.replace("_", " ").title()
                     
-                    CAFE_DATA[region_key] = data
-                    ALL_CAFES.extend(data)
+                    cafe_data[region_key] = data
+                    region_rows[region_key] = slice(len(all_cafes), len(all_cafes) + len(data))
+                    all_cafes.extend(data)
                 print(f"✓ Loaded {len(data)} cafes from {region_key}")
             except Exception as e:
                 print(f"✗ Error loading {filename}: {e}")
-                CAFE_DATA[region_key] = []
+                cafe_data[region_key] = []
+                region_rows[region_key] = slice(0, 0)
         else:
             print(f"✗ File not found: {filename}")
-            CAFE_DATA[region_key] = []
+            cafe_data[region_key] = []
+            region_rows[region_key] = slice(0, 0)
+    
+    search_index = SearchIndex(all_cafes)
+    geo_index = GeoIndex(all_cafes)
+    print(f"✓ Indexed {len(geo_index)} cafes with coordinates")
+    hours_index = HoursIndex(all_cafes)
+    print(f"✓ Compiled opening hours for {int(hours_index.known.sum())} cafes")
+
+    CAFE_DATA, ALL_CAFES, REGION_ROWS = cafe_data, all_cafes, region_rows
+    SEARCH_INDEX, GEO_INDEX, HOURS_INDEX = search_index, geo_index, hours_index
+    # New data drops every cached response at once
+    RESPONSE_CACHE.set_version(version)
+
+def reload_if_changed():
+    """Reload the region files if any was rewritten, appeared or disappeared since the last load"""
+    global _last_reload_check
+    with _reload_lock:
+        if time.monotonic() - _last_reload_check < RELOAD_CHECK_SECONDS:
+            return
+        if dataset_version(REGIONS.values()) != RESPONSE_CACHE.version:
+            print("↻ Region files changed on disk, reloading")
+            load_data()
+        _last_reload_check = time.monotonic()
 
 # Load data immediately
 load_data()
+_last_reload_check = time.monotonic()
+
+@app.middleware("http")
+async def reload_changed_data(request: Request, call_next):
+    # Cheap check first; the stat calls and a reload run off the event loop
+    if time.monotonic() - _last_reload_check >= RELOAD_CHECK_SECONDS:
+        await run_in_threadpool(reload_if_changed)
+    return await call_next(request)
 
 @app.get("/")
 def read_root():
@@ -59,40 +113,76 @@ def read_root():
         "endpoints": [
             "/cafes",
             "/cafes/{region}",
-            "/search?q={query}"
+            "/cafes/nearby?lat={lat}&lng={lng}&radius={km}",
+            "/cafes/open?at={iso datetime}",
+            "/search?q={query}",
+            "/search?q={query}&fuzzy=true"
         ]
     }
 
+def _open_rows(cafes, rows, at=None):
+    """cafes (ALL_CAFES[rows]) that are open at `at`, now by default"""
+    mask = HOURS_INDEX.open_mask(at)[rows]
+    return [cafes[i] for i in mask.nonzero()[0]]
+
 @app.get("/cafes", response_model=List[dict])
-def get_all_cafes(skip: int = 0, limit: int = 100):
+def get_all_cafes(request: Request, skip: int = 0, limit: int = 100,
+                  open_now: bool = Query(False, description="Only cafes open right now (Asia/Jakarta)")):
     """Get all cafes with pagination"""
-    return ALL_CAFES[skip : skip + limit]
+    if open_now:
+        # The open set only changes from one quarter-hour slot to the next
+        return RESPONSE_CACHE.respond(request, ("cafes", skip, limit, week_slot()),
+                                      lambda: HOURS_INDEX.open_at(skip=skip, limit=limit))
+    return RESPONSE_CACHE.respond(request, ("cafes", skip, limit, None), lambda: ALL_CAFES[skip : skip + limit])
+
+@app.get("/cafes/open", response_model=List[dict])
+def get_open_cafes(request: Request,
+                   at: Optional[datetime] = Query(None, description="ISO datetime; no timezone means Asia/Jakarta. Default: now"),
+                   skip: int = 0, limit: int = 100):
+    """Get cafes open at a given time (cafes without readable opening hours are left out)"""
+    # Every time in the same quarter-hour slot of the week gives the same page
+    slot = week_slot(at)
+    return RESPONSE_CACHE.respond(request, ("open", slot, skip, limit),
+                                  lambda: HOURS_INDEX.open_at(at, skip=skip, limit=limit))
+
+@app.get("/cafes/nearby", response_model=List[dict])
+def get_nearby_cafes(lat: float = Query(..., ge=-90, le=90), lng: float = Query(..., ge=-180, le=180),
+                     radius: float = Query(2.0, gt=0, le=50, description="Radius in km"),
+                     limit: int = Query(20, ge=1, le=100)):
+    """Get cafes within radius km of a point, nearest first (adds distance_km)"""
+    return [{**cafe, "distance_km": round(distance, 3)}
+            for cafe, distance in GEO_INDEX.nearby(lat, lng, radius, limit)]
 
 @app.get("/cafes/{region}", response_model=List[dict])
-def get_cafes_by_region(region: str, skip: int = 0, limit: int = 100):
+def get_cafes_by_region(request: Request, region: str, skip: int = 0, limit: int = 100,
+                        open_now: bool = Query(False, description="Only cafes open right now (Asia/Jakarta)")):
     """Get cafes by specific region (sleman, kota_yogyakarta, bantul, kulon_progo, gunung_kidul)"""
     region_key = region.lower().replace(" ", "_")
     if region_key not in CAFE_DATA:
         raise HTTPException(status_code=404, detail=f"Region '{region}' not found. Available: {list(REGIONS.keys())}")
     
-    return CAFE_DATA[region_key][skip : skip + limit]
+    if open_now:
+        return RESPONSE_CACHE.respond(request, ("region", region_key, skip, limit, week_slot()),
+                                      lambda: _open_rows(CAFE_DATA[region_key], REGION_ROWS[region_key])[skip : skip + limit])
+    return RESPONSE_CACHE.respond(request, ("region", region_key, skip, limit, None),
+                                  lambda: CAFE_DATA[region_key][skip : skip + limit])
 
 @app.get("/search", response_model=List[dict])
-def search_cafes(q: str = Query(..., min_length=3, description="Search query for cafe name")):
+def search_cafes(q: str = Query(..., min_length=3, description="Search query for cafe name"),
+                 fuzzy: bool = Query(False, description="Typo-tolerant name search ranked by match, rating and reviews")):
     """Search cafes by name (case-insensitive)"""
-    query = q.lower()
-    results = [
-        cafe for cafe in ALL_CAFES 
-        if query in cafe.get('name', '').lower() or query in cafe.get('address', '').lower()
-    ]
-    return results[:50]  # Limit search results
+    if fuzzy:
+        return SEARCH_INDEX.fuzzy(q, limit=50)
+    return SEARCH_INDEX.substring(q, limit=50)  # Limit search results
 
 @app.get("/stats")
-def get_stats():
+def get_stats(request: Request):
     """Get count stats per region"""
-    stats = {r: len(data) for r, data in CAFE_DATA.items()}
-    stats['total'] = sum(stats.values())
-    return stats
+    def build():
+        stats = {r: len(data) for r, data in CAFE_DATA.items()}
+        stats['total'] = sum(stats.values())
+        return stats
+    return RESPONSE_CACHE.respond(request, ("stats",), build)
 
 @app.post("/sync")
 def sync_to_supabase():
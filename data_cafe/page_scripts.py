@@ -0,0 +1,131 @@
+"""
+In-page JavaScript extractors shared by CafeScraper and AsyncCafeScraper.
+
+Each script reads everything an extractor needs in a single page.evaluate()
+call and returns plain data; the parse_* helpers turn that payload into the
+record fields. This replaces per-element locator round trips (count(),
+inner_text(), get_attribute() for every review block and tile).
+"""
+import re
+
+PHOTO_COUNT_RE = re.compile(r"(\d[\d.,]*)\s*\+?\s*(?:photos?|foto)\b", re.IGNORECASE)
+
+BASIC_INFO_JS = """() => {
+    const text = sel => { const el = document.querySelector(sel); return el ? el.innerText : null; };
+    const label = sel => { const el = document.querySelector(sel); return el ? (el.getAttribute('aria-label') || '') : null; };
+    return {
+        name: text('h1.DUwDvf'),
+        address: label("button[data-item-id='address']"),
+        rating: text('.F7nice'),
+        category: text('button.DkEaL'),
+        phone: label("button[data-item-id^='phone:']"),
+    };
+}"""
+
+HOURS_JS = """() => Array.from(document.querySelectorAll('table.eK4R0e tr')).map(row => row.innerText)"""
+
+# imgMarker: substring an <img> src must contain to be collected
+IMAGE_URLS_JS = """(imgMarker) => {
+    const urls = [];
+    document.querySelectorAll("div[style*='background-image']").forEach(el => {
+        const m = (el.getAttribute('style') || '').match(/url\\("([^"]+)"\\)/);
+        if (m) urls.push(m[1]);
+    });
+    document.querySelectorAll('img').forEach(img => {
+        const src = img.getAttribute('src') || '';
+        if (src.includes(imgMarker)) urls.push(src);
+    });
+    return urls;
+}"""
+
+# Background-image URLs of the tiles matching sel, from index start on
+TILE_URLS_SINCE_JS = """([sel, start]) => Array.from(document.querySelectorAll(sel)).slice(start)
+    .map(el => ((el.getAttribute('style') || '').match(/url\\("([^"]+)"\\)/) || [])[1])
+    .filter(Boolean)"""
+
+# Texts that may carry the place's photo count badge ("1.234 photos", "56 foto")
+PHOTO_COUNT_JS = """() => {
+    const texts = [];
+    document.querySelectorAll('button.aoRNLd, button[aria-label*="hoto"], button[aria-label*="foto"]').forEach(el => {
+        texts.push(el.getAttribute('aria-label') || '', el.innerText || '');
+    });
+    return texts;
+}"""
+
+REVIEWS_JS = """(limit) => Array.from(document.querySelectorAll('div.jftiEf')).slice(0, limit).map(block => {
+    const author = block.querySelector('.d4r55');
+    let ratingLabel = null;
+    for (const sel of ['span.kvqyne', 'span.kvMYIc', 'span.kvMY6c']) {
+        const el = block.querySelector(sel);
+        if (el && el.getAttribute('aria-label')) { ratingLabel = el.getAttribute('aria-label'); break; }
+    }
+    const text = block.querySelector('.wiI7pd');
+    return {author: author ? author.innerText : null, ratingLabel: ratingLabel, text: text ? text.innerText : ''};
+})"""
+
+
+def parse_basic_info(raw):
+    info = {'name': raw.get('name') or ""}
+
+    address = "N/A"
+    if raw.get('address') is not None:
+        address = raw['address'].replace("Address: ", "").replace("Alamat: ", "").strip()
+    info['address'] = address
+
+    rating = "N/A"
+    reviews_count = "N/A"
+    if raw.get('rating') is not None:
+        parts = raw['rating'].split("(")
+        if len(parts) > 0:
+            rating = parts[0].strip()
+        if len(parts) > 1:
+            reviews_count = parts[1].replace(")", "").strip()
+    info['rating'] = rating
+    info['reviews_count'] = reviews_count
+
+    info['category'] = raw['category'] if raw.get('category') is not None else "Cafe"
+
+    phone = "N/A"
+    if raw.get('phone') is not None:
+        phone = raw['phone'].replace("Phone: ", "").replace("Telepon: ", "").strip()
+    info['phone'] = phone
+    return info
+
+
+def parse_hour_rows(rows):
+    hours = []
+    for row in rows:
+        text = row.strip().replace("\n", " ")
+        if len(text) > 3:
+            hours.append(text)
+    return hours
+
+
+def parse_photo_count(texts):
+    """Largest '<n> photos' / '<n> foto' number in texts, or None when there is no badge."""
+    counts = []
+    for text in texts:
+        for match in PHOTO_COUNT_RE.finditer(text or ""):
+            digits = re.sub(r"[^\d]", "", match.group(1))
+            if digits:
+                counts.append(int(digits))
+    return max(counts) if counts else None
+
+
+def whole_text(text):
+    """Pattern for locator(has_text=...) that matches text exactly; a plain string matches substrings."""
+    return re.compile(rf"^\s*{re.escape(text)}\s*$")
+
+
+def parse_reviews(raw_reviews):
+    reviews = []
+    for r in raw_reviews:
+        rating = "N/A"
+        if r.get('ratingLabel'):
+            rating = r['ratingLabel'].split()[0]
+        reviews.append({
+            "author": r.get('author') if r.get('author') is not None else "N/A",
+            "rating": rating,
+            "text": r.get('text') or ""
+        })
+    return reviews
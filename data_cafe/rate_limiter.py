@@ -0,0 +1,100 @@
+"""
+Adaptive token bucket that paces cafe scrapes (PRD: respect basic rate limits).
+
+Each scrape takes one token. The refill rate creeps up while pages load cleanly
+and is cut on trouble:
+- a timeout or a slow page load halves the rate;
+- a captcha / "unusual traffic" page or a consent wall halves the rate and also
+  pauses every caller for a backoff that doubles with each consecutive block
+  signal.
+One limiter is shared by all workers of a run (threads in scraper_pool, tasks in
+async_scraper, processes in shard_runner through LimiterManager), so one worker
+hitting a captcha slows everyone down.
+"""
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+DEFAULT_RATE = 0.5          # cafes per second to start with
+MIN_RATE = 0.05
+MAX_RATE = 2.0
+RATE_STEP = 0.05            # added after every clean page
+SLOW_PAGE_SECONDS = 90      # a whole cafe taking longer than this counts as slow
+BACKOFF_BASE = 30.0
+BACKOFF_MAX = 900.0
+
+# Signals CafeScraper.last_signal can carry
+TIMEOUT = "timeout"
+CAPTCHA = "captcha"
+CONSENT = "consent"
+BLOCK_SIGNALS = (CAPTCHA, CONSENT)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=1, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max(max_rate, rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.strikes = 0
+        self.waited = 0.0
+        self.signals = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token now and return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            wait = max(wait, self.paused_until - now)
+            self.waited += wait
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def report(self, signal=None, seconds=None):
+        """Feed back how the last scrape went: signal from CafeScraper.last_signal, its duration."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if signal:
+                self.signals[signal] = self.signals.get(signal, 0) + 1
+            if signal in BLOCK_SIGNALS:
+                self.strikes += 1
+                backoff = min(BACKOFF_BASE * 2 ** (self.strikes - 1), BACKOFF_MAX)
+                self.paused_until = max(self.paused_until, now + backoff)
+                self.rate = max(self.min_rate, self.rate / 2)
+                print(f"  [rate] {signal} — pausing {backoff:.0f}s, rate now {self.rate * 60:.1f}/min")
+            elif signal == TIMEOUT or (seconds is not None and seconds > SLOW_PAGE_SECONDS):
+                self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                self.strikes = 0
+                self.rate = min(self.max_rate, self.rate + RATE_STEP)
+
+    def summary(self):
+        signals = ", ".join(f"{k}={v}" for k, v in sorted(self.signals.items())) or "no block signals"
+        return f"rate {self.rate * 60:.1f} cafes/min, {self.waited:.0f}s paced, {signals}"
+
+
+class LimiterManager(BaseManager):
+    """
+    Serves one AdaptiveRateLimiter to several processes. The proxy it hands out is
+    picklable and has the limiter's methods; acquire() waits on the caller's own
+    connection, so one sleeping worker doesn't hold up the others.
+    """
+
+
+LimiterManager.register("AdaptiveRateLimiter", AdaptiveRateLimiter,
+                        exposed=("reserve", "acquire", "report", "summary"))
@@ -0,0 +1,213 @@
+"""
+Append-only record store for the region files.
+
+Scrapers append each finished cafe as one line to cafe_data_<Region>.jsonl
+instead of re-reading and rewriting the whole cafe_data_<Region>.json after
+every cafe. compact() replays the log into the canonical JSON (same
+replace-by-name-or-append rule as before, written atomically) and empties
+the log. RecordStore also keeps an in-memory index of normalized names and
+Maps place ids for O(1) duplicate checks. Run compaction at the end of a
+scrape, or by hand after a crash:
+
+    python record_store.py compact                 # every cafe_data_*.jsonl
+    python record_store.py compact cafe_data_Sleman.json
+
+Sharded batch runs give each worker process its own log
+(cafe_data_<Region>.<shard>.jsonl) so no two processes append to the same
+file; compaction folds every shard log of a region in turn.
+"""
+import glob
+import json
+import os
+import re
+import sys
+
+# cafe_data_Sleman.jsonl / cafe_data_Sleman.s2of4.jsonl -> cafe_data_Sleman.json
+LOG_NAME_RE = re.compile(r'^(?P<stem>.+?)(?:\.(?P<shard>[^./\\]+))?\.jsonl$')
+
+# Maps feature id (…!1s0x2e7a…:0x44fd…) or ChIJ place id embedded in a place link
+PLACE_ID_PATTERNS = [
+    re.compile(r'!1s(0x[0-9a-f]+:0x[0-9a-f]+)'),
+    re.compile(r'!19s(ChIJ[\w-]+)'),
+]
+
+
+def normalize_name(name):
+    return " ".join((name or "").lower().split())
+
+
+def place_id_from_link(link):
+    if not link:
+        return None
+    for pattern in PLACE_ID_PATTERNS:
+        match = pattern.search(link)
+        if match:
+            return match.group(1)
+    return None
+
+
+def region_file_for_log(log_path):
+    match = LOG_NAME_RE.match(log_path)
+    return match.group('stem') + ".json" if match else None
+
+
+class RecordStore:
+    def __init__(self, region_file, shard=None):
+        """shard, if given, names a separate log owned by one worker process."""
+        self.region_file = region_file
+        self.shard = shard
+        stem = os.path.splitext(region_file)[0]
+        self.log_path = f"{stem}.{shard}.jsonl" if shard else stem + ".jsonl"
+        self.appended = 0
+        self._log_checked = False
+        # Normalized names and place ids, built on first lookup and kept up to date by append()
+        self._names = None
+        self._place_ids = None
+
+    def _index_record(self, data):
+        self._names.add(normalize_name(data.get('name')))
+        place_id = place_id_from_link(data.get('link'))
+        if place_id:
+            self._place_ids.add(place_id)
+
+    def _build_index(self):
+        self._names = set()
+        self._place_ids = set()
+        for data in self.load():
+            self._index_record(data)
+        for entry in self._read_log():
+            self._index_record(entry["record"])
+
+    def shard_stores(self):
+        """Stores for every shard log left next to this region file."""
+        stem = os.path.splitext(self.region_file)[0]
+        shards = []
+        for path in sorted(glob.glob(glob.escape(stem) + ".*.jsonl")):
+            match = LOG_NAME_RE.match(path)
+            if match and match.group('stem') == stem and match.group('shard'):
+                shards.append(RecordStore(self.region_file, shard=match.group('shard')))
+        return shards
+
+    def contains(self, name=None, link=None):
+        """O(1) duplicate check by Maps place id (from link) or normalized name."""
+        if self._names is None:
+            self._build_index()
+        place_id = place_id_from_link(link)
+        if place_id and place_id in self._place_ids:
+            return True
+        return bool(name) and normalize_name(name) in self._names
+
+    def append(self, data, replace_name=None):
+        """
+        Log a record. On compaction it replaces the entry named replace_name
+        (defaults to the record's own name), or is appended as a new cafe.
+        """
+        entry = {"replace": replace_name or data.get('name'), "record": data}
+        if not self._log_checked:
+            self._terminate_torn_line()
+            self._log_checked = True
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.appended += 1
+        if self._names is not None:
+            self._index_record(data)
+
+    def _terminate_torn_line(self):
+        """A crash can leave half a line at the end of the log; without a newline the next entry would join it."""
+        try:
+            with open(self.log_path, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+        except FileNotFoundError:
+            pass
+
+    def _read_log(self):
+        entries = []
+        if not os.path.exists(self.log_path):
+            return entries
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except Exception:
+                    # Torn last line from a crash
+                    continue
+        return entries
+
+    def load(self):
+        if not os.path.exists(self.region_file):
+            return []
+        with open(self.region_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def compact(self):
+        """Fold the log into the canonical JSON file. Returns the number of records applied."""
+        entries = self._read_log()
+        if not entries:
+            return 0
+
+        current = self.load()
+        by_name = {}
+        by_place = {}
+
+        def remember(data, idx):
+            by_name[normalize_name(data.get('name'))] = idx
+            place_id = place_id_from_link(data.get('link'))
+            if place_id:
+                by_place[place_id] = idx
+
+        for i, d in enumerate(current):
+            remember(d, i)
+        for entry in entries:
+            data = entry["record"]
+            # Same place first, then the name the writer asked to replace, then the record's own name
+            idx = by_place.get(place_id_from_link(data.get('link')))
+            if idx is None:
+                idx = by_name.get(normalize_name(entry.get("replace")))
+            if idx is None:
+                idx = by_name.get(normalize_name(data.get('name')))
+            if idx is not None:
+                current[idx] = data
+            else:
+                current.append(data)
+                idx = len(current) - 1
+            remember(data, idx)
+
+        tmp_path = self.region_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.region_file)
+        os.remove(self.log_path)
+        print(f"  Compacted {len(entries)} records into {self.region_file}")
+        return len(entries)
+
+
+def compact_region(region_file):
+    """Fold the main log and every shard log of one region file."""
+    store = RecordStore(region_file)
+    total = store.compact()
+    for shard_store in store.shard_stores():
+        total += shard_store.compact()
+    return total
+
+
+def compact_all(region_files=None):
+    if not region_files:
+        region_files = sorted({region_file_for_log(p) for p in glob.glob("cafe_data_*.jsonl")} - {None})
+    total = 0
+    for region_file in region_files:
+        total += compact_region(region_file)
+    print(f"Compaction done: {total} records applied.")
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        compact_all(sys.argv[2:])
+    else:
+        print(__doc__)
@@ -0,0 +1,184 @@
+"""
+Record/replay harness for the extractors.
+
+record   opens each place link once against live Maps with a HAR recorder on the
+         context, runs the normal scrape (so gallery scrolls, chip clicks and review
+         scrolls are captured too) and writes one <slug>.har.zip per cafe plus
+         manifest.json with the values the live scrape produced.
+check    replays every fixture with route_from_har (requests missing from the HAR
+         are aborted, nothing goes to the network) and compares name, category and
+         counts against the manifest. Exits 1 on any mismatch.
+bench    replays the fixtures `--rounds` times and reports cafes/minute plus the
+         per-phase p50/p95 from scrape_metrics.
+
+Usage:
+    python replay_harness.py record --input test_tomoro.json
+    python replay_harness.py record --url "https://www.google.com/maps/place/..."
+    python replay_harness.py check
+    python replay_harness.py bench --rounds 3 --fast
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from scraper import CafeScraper
+from record_store import place_id_from_link
+from scrape_metrics import ScrapeMetrics, load_events, summarize
+
+DEFAULT_FIXTURES = "replay_fixtures"
+MANIFEST = "manifest.json"
+
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", (name or "cafe").lower()).strip("-") or "cafe"
+
+
+def snapshot(data):
+    """The values check compares; chosen to be stable across replays of the same HAR."""
+    menu = data.get('menu') or {}
+    return {
+        "name": data.get('name'),
+        "category": data.get('category'),
+        "rating": data.get('rating'),
+        "opening_hours": len(data.get('opening_hours') or []),
+        "photos": len(data.get('photos') or []),
+        "menu_images": len(menu.get('images') or []),
+        "reviews": len(data.get('customer_reviews') or []),
+    }
+
+
+def load_manifest(fixtures_dir):
+    path = os.path.join(fixtures_dir, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(fixtures_dir, entries):
+    with open(os.path.join(fixtures_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=4, ensure_ascii=False)
+
+
+def record(targets, fixtures_dir=DEFAULT_FIXTURES, headless=True):
+    """targets: (name, address, link) tuples; a link is required to replay later."""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    entries = {e['slug']: e for e in load_manifest(fixtures_dir)}
+    scraper = CafeScraper()
+    scraper.start_browser(headless=headless)
+    try:
+        for name, address, link in targets:
+            slug = slugify(name) if name else slugify(place_id_from_link(link) or link)[:60]
+            har_path = os.path.join(fixtures_dir, f"{slug}.har.zip")
+            # A fresh context per cafe: the HAR is written when that context closes
+            scraper.context_options = {'record_har_path': har_path, 'record_har_mode': 'full'}
+            scraper.recycle_context()
+            print(f"\nRecording {name or link} -> {har_path}")
+            data = scraper.scrape_place(name, address, link)
+            if not data:
+                print("  ✗ Nothing scraped, fixture not saved")
+                continue
+            # Replays open the place page directly, so store the resolved link
+            entries[slug] = {"slug": slug, "har": os.path.basename(har_path), "url": data['link'],
+                             "expected": snapshot(data)}
+        scraper.context_options = {}
+        scraper.recycle_context()
+    finally:
+        scraper.close_browser()
+    save_manifest(fixtures_dir, sorted(entries.values(), key=lambda e: e['slug']))
+    print(f"\n{len(entries)} fixtures in {fixtures_dir}")
+
+
+def _replay(scraper, fixtures_dir, entry):
+    scraper.replay_har = os.path.join(fixtures_dir, entry['har'])
+    scraper.recycle_context()
+    return scraper.scrape_place(entry['expected'].get('name'), "", entry['url'])
+
+
+def check(fixtures_dir=DEFAULT_FIXTURES, headless=True, block_resources=False):
+    entries = load_manifest(fixtures_dir)
+    if not entries:
+        print(f"No fixtures in {fixtures_dir}; run 'record' first.")
+        return 1
+    scraper = CafeScraper()
+    scraper.start_browser(headless=headless, block_resources=block_resources)
+    mismatches = 0
+    try:
+        for entry in entries:
+            data = _replay(scraper, fixtures_dir, entry)
+            got = snapshot(data) if data else {}
+            diffs = {k: (v, got.get(k)) for k, v in entry['expected'].items() if got.get(k) != v}
+            if diffs:
+                mismatches += 1
+                print(f"  ✗ {entry['slug']}: " + ", ".join(f"{k} expected {a!r} got {b!r}" for k, (a, b) in diffs.items()))
+            else:
+                print(f"  ✓ {entry['slug']}")
+    finally:
+        scraper.close_browser()
+    print(f"\n{len(entries) - mismatches}/{len(entries)} fixtures match.")
+    return 1 if mismatches else 0
+
+
+def bench(fixtures_dir=DEFAULT_FIXTURES, rounds=1, headless=True, block_resources=False, metrics_path=None,
+          **scraper_options):
+    entries = load_manifest(fixtures_dir)
+    if not entries:
+        print(f"No fixtures in {fixtures_dir}; run 'record' first.")
+        return 1
+    metrics_path = metrics_path or os.path.join(fixtures_dir, f"bench_{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+    scraper = CafeScraper(metrics=ScrapeMetrics(metrics_path), **scraper_options)
+    scraper.start_browser(headless=headless, block_resources=block_resources)
+    started = time.time()
+    scraped = 0
+    try:
+        for r in range(rounds):
+            for entry in entries:
+                if _replay(scraper, fixtures_dir, entry):
+                    scraped += 1
+    finally:
+        scraper.close_browser()
+    minutes = (time.time() - started) / 60
+    total = rounds * len(entries)
+    print(f"\n=== Replay benchmark: {total} cafes ({scraped} scraped) in {minutes:.2f} min "
+          f"-> {total / max(minutes, 1e-6):.2f} cafes/min ===")
+    print(summarize(load_events([metrics_path])))
+    print(f"Events: {metrics_path}")
+    return 0
+
+
+def _targets_from_args(args):
+    targets = [(None, "", url) for url in args.url or []]
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            for task in json.load(f):
+                targets.append((task.get('name'), task.get('address', ''), task.get('link')))
+    return targets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record Maps pages once, replay the extractors offline")
+    parser.add_argument("command", choices=["record", "check", "bench"])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--url", action="append", help="place link to record (repeatable)")
+    parser.add_argument("--input", help="task list (name/address/link) to record")
+    parser.add_argument("--rounds", type=int, default=1, help="bench: replays per fixture")
+    parser.add_argument("--headful", action="store_true", help="show the browser window")
+    parser.add_argument("--fast", action="store_true",
+                        help="block fonts, map tiles, analytics and non-photo images")
+    parser.add_argument("--parallel-chips", action="store_true",
+                        help="scan menu/food/drink gallery chips in sibling pages concurrently")
+    parser.add_argument("--metrics", help="bench: where to write the timing events")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        targets = _targets_from_args(args)
+        if not targets:
+            parser.error("record needs --url or --input")
+        record(targets, args.fixtures, headless=not args.headful)
+    elif args.command == "check":
+        sys.exit(check(args.fixtures, headless=not args.headful, block_resources=args.fast))
+    else:
+        sys.exit(bench(args.fixtures, args.rounds, headless=not args.headful, block_resources=args.fast,
+                       metrics_path=args.metrics, parallel_menu_chips=args.parallel_chips))
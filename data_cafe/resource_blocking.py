@@ -0,0 +1,111 @@
+"""
+Opt-in request-routing profile for fast Maps page loads.
+
+Aborts requests the scraper never looks at: web fonts, media, map tiles,
+street view imagery, analytics/logging beacons and non-photo images. Scripts,
+XHR, stylesheets (the gallery panel needs layout to scroll) and googleusercontent
+place photos (the gallery thumbnails) are let through.
+
+Aborted requests have no response, so "bytes saved" is an estimate from typical
+sizes per blocked kind; bytes actually loaded come from Content-Length headers.
+"""
+import re
+from scraper import is_place_photo_url
+
+# resource type -> blocked kind
+BLOCKED_RESOURCE_TYPES = {
+    "font": "font",
+    "media": "media",
+    "texttrack": "media",
+    "manifest": "other",
+    "eventsource": "other",
+}
+
+TILE_PATTERNS = [
+    re.compile(r"https://khms?\d*\.google(apis)?\.com/"),
+    re.compile(r"https://[^/]+\.google\.com/maps/vt"),
+    re.compile(r"https://[^/]+/maps/vt/"),
+    re.compile(r"https://streetviewpixels-pa\.googleapis\.com/"),
+    re.compile(r"https://geo\d*\.ggpht\.com/"),
+]
+
+ANALYTICS_PATTERNS = [
+    re.compile(r"https://(www\.)?google-analytics\.com/"),
+    re.compile(r"https://(www\.)?googletagmanager\.com/"),
+    re.compile(r"https://[^/]*doubleclick\.net/"),
+    re.compile(r"https://play\.google\.com/log"),
+    re.compile(r"/gen_204"),
+    re.compile(r"/log204"),
+    re.compile(r"/maps/preview/log"),
+]
+
+# Typical transfer sizes, only used to estimate what an aborted request would have cost
+ESTIMATED_BYTES = {
+    "font": 40_000,
+    "media": 250_000,
+    "tile": 20_000,
+    "image": 30_000,
+    "analytics": 500,
+}
+
+
+class ResourceBlocker:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start counting for a new page load."""
+        self.blocked = {}
+        self.loaded_bytes = 0
+        self.loaded_requests = 0
+
+    def classify(self, request):
+        """Return the blocked kind for a request, or None to let it through."""
+        url = request.url
+        rtype = request.resource_type
+        if rtype in BLOCKED_RESOURCE_TYPES:
+            return BLOCKED_RESOURCE_TYPES[rtype]
+        if any(p.search(url) for p in ANALYTICS_PATTERNS):
+            return "analytics"
+        if any(p.search(url) for p in TILE_PATTERNS):
+            return "tile"
+        if rtype == "image" and not is_place_photo_url(url):
+            return "image"
+        return None
+
+    def _count(self, kind):
+        self.blocked[kind] = self.blocked.get(kind, 0) + 1
+
+    def handle(self, route):
+        """Route handler for the sync API."""
+        kind = self.classify(route.request)
+        if kind:
+            self._count(kind)
+            route.abort()
+        else:
+            route.continue_()
+
+    async def handle_async(self, route):
+        """Route handler for the async API."""
+        kind = self.classify(route.request)
+        if kind:
+            self._count(kind)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def on_response(self, response):
+        try:
+            self.loaded_requests += 1
+            self.loaded_bytes += int(response.headers.get("content-length", 0))
+        except: pass
+
+    @property
+    def estimated_saved_bytes(self):
+        return sum(ESTIMATED_BYTES.get(kind, 0) * n for kind, n in self.blocked.items())
+
+    def page_summary(self):
+        total = sum(self.blocked.values())
+        kinds = ", ".join(f"{k}={n}" for k, n in sorted(self.blocked.items())) or "none"
+        return (f"blocked {total} requests ({kinds}), ~{self.estimated_saved_bytes / 1024:.0f} KB saved (est.), "
+                f"{self.loaded_requests} loaded / {self.loaded_bytes / 1024:.0f} KB")
@@ -0,0 +1,99 @@
+"""
+Pre-serialized JSON responses for the API's hot list endpoints.
+
+A page is encoded to bytes once (orjson when installed, json otherwise) and
+kept in a bounded LRU keyed by route and query params, together with a strong
+ETag over those bytes. A client repeating the request with If-None-Match gets
+a bare 304. load_data sets the dataset version from the region files, and
+main reloads them when a periodic check sees that version change; the whole
+cache is dropped at once then.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def encode_json(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+
+def dataset_version(paths):
+    """Changes whenever any of the files is rewritten, appears or disappears."""
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        except OSError:
+            digest.update(f"{path}:missing;".encode())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def set_version(self, version):
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self.entries.clear()
+                self.size = 0
+
+    def get(self, key, build):
+        """(body, etag) for key, calling build() for the payload on a miss."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            version = self.version
+
+        body = encode_json(build())
+        etag = f'"{version}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        with self._lock:
+            self.misses += 1
+            if version != self.version or len(body) > self.max_bytes:
+                # Reloaded while building, or too big to keep: serve it once
+                return body, etag
+            if key not in self.entries:
+                self.entries[key] = (body, etag)
+                self.size += len(body)
+                while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                    _, (old_body, _) = self.entries.popitem(last=False)
+                    self.size -= len(old_body)
+            return self.entries[key]
+
+    def respond(self, request: Request, key, build):
+        """200 with the cached bytes, or 304 when If-None-Match already has them."""
+        body, etag = self.get(key, build)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def summary(self):
+        return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                "version": self.version}
@@ -0,0 +1,116 @@
+"""
+Crash-safe checkpoint journal for scrape runs.
+
+Every finished task appends one JSON line (key, status, timestamp, reason) and
+fsyncs, so a run killed at cafe 700 can be restarted with the same journal and
+pick up at 701. The last line for a key wins; a torn last line from a crash is
+ignored on load.
+
+Statuses:
+    done     scraped and written to the region file
+    failed   not found / error; rerun with --retry-failed (kept when a run is archived)
+    skipped  non-cafe category, never retried
+"""
+import json
+import os
+from datetime import datetime
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def task_key(name, address=""):
+    return f"{(name or '').lower().strip()}|{(address or '').lower().strip()}"
+
+
+class ScrapeJournal:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        torn = False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                torn = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                    self.entries[entry['key']] = entry
+                except Exception:
+                    continue
+        if torn:
+            # Terminate a half-written line so the next record starts cleanly
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("\n")
+        counts = self.counts()
+        print(f"Resuming from {self.path}: {counts.get(DONE, 0)} done, "
+              f"{counts.get(FAILED, 0)} failed, {counts.get(SKIPPED, 0)} skipped")
+
+    def record(self, key, status, reason=None, **extra):
+        entry = {
+            "key": key,
+            "status": status,
+            "ts": datetime.now().isoformat(timespec='seconds'),
+            "attempts": self.entries.get(key, {}).get("attempts", 0) + 1,
+        }
+        if reason:
+            entry["reason"] = reason
+        entry.update(extra)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[key] = entry
+
+    def status(self, key):
+        entry = self.entries.get(key)
+        return entry["status"] if entry else None
+
+    def should_run(self, key, retry_failed=False):
+        """Fresh tasks run normally; with retry_failed only previously failed ones run."""
+        status = self.status(key)
+        if retry_failed:
+            return status == FAILED
+        return status is None
+
+    def counts(self):
+        counts = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def archive(self):
+        """
+        Close out a completed run: keep the file for history, next run starts with only
+        the failed entries, so --retry-failed still finds them after the cycle ends.
+        """
+        if not os.path.exists(self.path):
+            return None
+        stem, ext = os.path.splitext(self.path)
+        archived = f"{stem}_{datetime.now().strftime('%Y%m%d-%H%M%S')}{ext}"
+        carried = {key: entry for key, entry in self.entries.items() if entry["status"] == FAILED}
+        temp = self.path + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            for entry in carried.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path, archived)
+        os.replace(temp, self.path)
+        self.entries = carried
+        return archived
+
+
+def default_journal_path(input_file):
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    return f"scrape_journal_{stem}.jsonl"
+
+
+def discard_journal(path):
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"Discarded journal {path}")
@@ -0,0 +1,146 @@
+"""
+Per-cafe timing events for scrape runs.
+
+With --metrics <path> the scrapers append one JSON line per cafe:
+
+    {"event": "cafe", "name": ..., "mode": "full" | "delta", "outcome": "done",
+     "started": 1760000000.1, "total_s": 41.2,
+     "phases": {"goto": 3.1, "opening_hours": 0.4, "gallery": 22.9, ...},
+     "counts": {"tiles": 180, "menu_chips": 2, "reviews": 10, ...}}
+
+Phases that run more than once for a cafe (e.g. a failed direct link followed
+by a search) are summed. Summarize one or more runs with:
+
+    python scrape_metrics.py summary metrics.jsonl
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from scrape_journal import FAILED
+
+
+class CafeTimer:
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.started = time.time()
+        self.phases = {}
+        self.counts = {}
+        self.outcome = FAILED
+        self.reason = "exception"
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.time() - t0
+
+    def count(self, key, n):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def set_outcome(self, outcome, reason=None):
+        self.outcome = outcome
+        self.reason = reason
+
+    def event(self):
+        event = {
+            "event": "cafe",
+            "name": self.name,
+            "mode": self.mode,
+            "outcome": self.outcome,
+            "started": round(self.started, 3),
+            "total_s": round(time.time() - self.started, 3),
+            "phases": {k: round(v, 3) for k, v in self.phases.items()},
+            "counts": self.counts,
+        }
+        if self.reason:
+            event["reason"] = self.reason
+        return event
+
+
+class ScrapeMetrics:
+    """JSONL sink shared by every scraper of a run (thread-safe)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def start_cafe(self, name, mode="full"):
+        return CafeTimer(name, mode)
+
+    def finish_cafe(self, timer):
+        line = json.dumps(timer.event(), ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def load_events(paths):
+    events = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except Exception:
+                    continue
+                if event.get("event") == "cafe":
+                    events.append(event)
+    return events
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(events):
+    if not events:
+        return "No cafe events."
+    lines = []
+    first = min(e["started"] for e in events)
+    last = max(e["started"] + e["total_s"] for e in events)
+    minutes = max(last - first, 1e-6) / 60
+    outcomes = {}
+    for e in events:
+        outcomes[e["outcome"]] = outcomes.get(e["outcome"], 0) + 1
+    lines.append(f"{len(events)} cafes in {minutes:.1f} min ({len(events) / minutes:.2f} cafes/min); "
+                 + ", ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+
+    phases = {}
+    for e in events:
+        for name, seconds in e.get("phases", {}).items():
+            phases.setdefault(name, []).append(seconds)
+    phases["total"] = [e["total_s"] for e in events]
+    lines.append(f"{'phase':<16}{'n':>6}{'p50 s':>9}{'p95 s':>9}{'mean s':>9}{'share':>8}")
+    grand_total = sum(phases["total"]) or 1e-6
+    order = sorted((k for k in phases if k != "total"), key=lambda k: -sum(phases[k])) + ["total"]
+    for name in order:
+        values = phases[name]
+        lines.append(f"{name:<16}{len(values):>6}{percentile(values, 50):>9.2f}{percentile(values, 95):>9.2f}"
+                     f"{sum(values) / len(values):>9.2f}{sum(values) / grand_total:>8.0%}")
+
+    counts = {}
+    for e in events:
+        for key, n in e.get("counts", {}).items():
+            counts.setdefault(key, []).append(n)
+    if counts:
+        lines.append(f"{'count':<16}{'n':>6}{'p50':>9}{'p95':>9}{'mean':>9}")
+        for key in sorted(counts):
+            values = counts[key]
+            lines.append(f"{key:<16}{len(values):>6}{percentile(values, 50):>9}{percentile(values, 95):>9}"
+                         f"{sum(values) / len(values):>9.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "summary":
+        print(summarize(load_events(sys.argv[2:])))
+    else:
+        print(__doc__)
@@ -1,10 +1,25 @@
+import argparse
 import json
 import time
 import os
 import re
 import sys
 import requests
-from playwright.sync_api import sync_playwright
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from record_store import RecordStore
+from browser_lifecycle import BrowserLifecycle, add_lifecycle_arguments, lifecycle_options
+from scrape_metrics import ScrapeMetrics
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_RATE, BLOCK_SIGNALS, CAPTCHA, CONSENT, TIMEOUT
+from failure_policy import (
+    classify_failure, FailureTracker, RetryQueue, dead_letter_path, NOT_FOUND, NETWORK, BROWSER, BLOCKED,
+)
+from scrape_journal import ScrapeJournal, task_key, default_journal_path, discard_journal, DONE, FAILED, SKIPPED
+from page_scripts import (
+    BASIC_INFO_JS, HOURS_JS, IMAGE_URLS_JS, PHOTO_COUNT_JS, REVIEWS_JS, TILE_URLS_SINCE_JS,
+    parse_basic_info, parse_hour_rows, parse_photo_count, parse_reviews, whole_text,
+)
 
 # Fix Windows console encoding if needed
 if sys.platform == "win32":
@@ -14,6 +29,107 @@ if sys.platform == "win32":
     except:
         pass
 
+# Mapping for output based on address keywords
+REGION_MAPPING = {
+    "sleman": "cafe_data_Sleman.json",
+    "kota yogyakarta": "cafe_data_Kota_Yogyakarta.json",
+    "yogyakarta city": "cafe_data_Kota_Yogyakarta.json",
+    "bantul": "cafe_data_Bantul.json",
+    "kulon progo": "cafe_data_Kulon_Progo.json",
+    "gunung kidul": "cafe_data_Gunung_Kidul.json",
+    "gunungkidul": "cafe_data_Gunung_Kidul.json",
+}
+
+# Filter non-cafe entries (allowed: cafe, coffee, kopi, kedai, resto, etc.)
+ALLOWED_CATEGORIES = ['cafe', 'kafe', 'coffee', 'kopi', 'kedai', 'roaster', 'bakery', 'tea', 'boba',
+                      'dessert', 'beverage', 'minuman', 'restaurant', 'restoran', 'warung kopi',
+                      'espresso']
+
+MENU_CHIP_KEYWORDS = ('menu', 'food', 'makanan', 'minuman', 'drink')
+
+GALLERY_PANEL = '.m6QErb.DxyBCb'
+GALLERY_TILE = f"{GALLERY_PANEL} div[style*='background-image']"
+REVIEW_BLOCK = "div.jftiEf"
+
+# Adaptive waits: continue as soon as new tiles/reviews render, give up after the timeout.
+# Two empty rounds of 3s keep the same patience as the old five rounds of 1.2s.
+GALLERY_SCROLL_SLEEP = 1.2
+GALLERY_GROWTH_TIMEOUT = 3.0
+GALLERY_NO_CHANGE_ROUNDS = 2
+REVIEW_SCROLLS = 8
+REVIEW_SCROLL_SLEEP = 1.5
+REVIEW_GROWTH_TIMEOUT = 3.0
+REVIEW_TARGET = 10
+
+COUNT_GREW_JS = "([sel, n]) => document.querySelectorAll(sel).length > n"
+
+# Incremental gallery scans stop once a freshly loaded batch of at least this many tiles is all known
+KNOWN_SCREEN_TILES = 6
+
+
+def is_cafe_category(category):
+    cat_lower = (category or '').lower()
+    return any(keyword in cat_lower for keyword in ALLOWED_CATEGORIES)
+
+
+def get_hd_image_url(url):
+    if not url or "googleusercontent.com" not in url: return url
+    if "=" in url:
+        return f"{url.split('=')[0]}=s0"
+    return url
+
+
+# Place photos live under these paths; /a/ and /a-/ are reviewer avatars
+PLACE_PHOTO_PATHS = ('/p/', '/gps-cs-s/', '/gps-proxy/')
+
+
+def merge_photo_lists(fresh, stored):
+    """New photos first (newest-first like the gallery), then the stored list in its order."""
+    stored = list(stored or [])
+    seen = set(stored)
+    return [u for u in fresh if u not in seen] + stored
+
+
+def is_place_photo_url(url):
+    return bool(url) and "googleusercontent.com" in url and any(p in url for p in PLACE_PHOTO_PATHS)
+
+
+def block_signal_for_url(url):
+    """CAPTCHA / CONSENT when Google served an interstitial instead of the Maps page."""
+    url = url or ""
+    if "consent.google." in url:
+        return CONSENT
+    if "/sorry/" in url or "recaptcha" in url:
+        return CAPTCHA
+    return None
+
+
+class WaitSavings:
+    """Wall-clock accounting: adaptive waits vs. the fixed sleeps they replaced."""
+
+    def __init__(self):
+        self.waits = 0
+        self.fixed_seconds = 0.0
+        self.actual_seconds = 0.0
+
+    def add(self, fixed, actual):
+        self.waits += 1
+        self.fixed_seconds += fixed
+        self.actual_seconds += actual
+
+    def skip(self, fixed):
+        """Sleeps the old loop would still have done after we stopped early."""
+        self.fixed_seconds += fixed
+
+    @property
+    def saved_seconds(self):
+        return self.fixed_seconds - self.actual_seconds
+
+    def summary(self):
+        return (f"{self.waits} adaptive waits took {self.actual_seconds:.1f}s "
+                f"vs {self.fixed_seconds:.1f}s fixed (saved {self.saved_seconds:.1f}s)")
+
+
 class CafeScraper:
     """
     Robust Cafe Scraper for Google Maps.
@@ -22,37 +138,124 @@ class CafeScraper:
     - checks for duplicates
     """
     
-    def __init__(self, input_file="consolidated_list.json"):
+    def __init__(self, input_file="consolidated_list.json", capture_network_images=False,
+                 parallel_menu_chips=False, metrics=None):
         self.input_file = input_file
+        # ScrapeMetrics sink for per-phase timings; _timer is the cafe being timed
+        self.metrics = metrics
+        self._timer = None
+        # Scan menu/food/drink gallery chips in sibling pages at the same time
+        self.parallel_menu_chips = parallel_menu_chips
+        self._place_url = None
+        self.blocker = None
+        # Collect gallery photo URLs from network responses instead of walking the DOM
+        self.capture_network_images = capture_network_images
+        self._captured_images = set()
+        # Set when the last scrape was dropped on purpose (non-cafe category)
+        self.last_skip = None
+        # Why the last scrape failed, when known: captcha, consent or timeout (see rate_limiter)
+        self.last_signal = None
+        # Failure class of the last scrape (see failure_policy), None when it did not fail
+        self.last_failure = None
         self.browser = None
+        self.context = None
         self.page = None
         self.playwright = None
+        # Remembered so the lifecycle manager can restart the browser the same way
+        self.launch_options = {}
+        # Extra new_context() arguments (e.g. record_har_path) and a HAR to serve pages from;
+        # both apply from the next context on (see replay_harness.py)
+        self.context_options = {}
+        self.replay_har = None
         
         # Mapping for output based on address keywords
-        self.region_mapping = {
-            "sleman": "cafe_data_Sleman.json",
-            "kota yogyakarta": "cafe_data_Kota_Yogyakarta.json",
-            "yogyakarta city": "cafe_data_Kota_Yogyakarta.json",
-            "bantul": "cafe_data_Bantul.json",
-            "kulon progo": "cafe_data_Kulon_Progo.json",
-            "gunung kidul": "cafe_data_Gunung_Kidul.json",
-            "gunungkidul": "cafe_data_Gunung_Kidul.json",
-        }
+        self.region_mapping = dict(REGION_MAPPING)
+        self.stores = {}
+        self.wait_savings = WaitSavings()
         
-    def start_browser(self, headless=True):
+    def start_browser(self, headless=True, cdp_endpoint=None, block_resources=False):
+        """
+        Start a page in its own browser context.
+        With cdp_endpoint, attach to an already running browser (worker-pool mode)
+        instead of launching a new one. block_resources enables the fast-load
+        routing profile from resource_blocking.py.
+        """
         print(f"Starting browser (headless={headless})...")
+        self.launch_options = {'headless': headless, 'cdp_endpoint': cdp_endpoint, 'block_resources': block_resources}
         self.playwright = sync_playwright().start()
-        # Using msedge as requested, with configurable headless mode
-        self.browser = self.playwright.chromium.launch(channel="msedge", headless=headless)
-        # locale en-US so Maps shows English labels ('Overview','Menu','Reviews','About')
-        self.page = self.browser.new_page(locale="en-US", extra_http_headers={"Accept-Language": "en-US,en;q=0.9"})
+        if cdp_endpoint:
+            self.browser = self.playwright.chromium.connect_over_cdp(cdp_endpoint)
+        else:
+            # Using msedge as requested, with configurable headless mode
+            self.browser = self.playwright.chromium.launch(channel="msedge", headless=headless)
+        if block_resources and not self.blocker:
+            from resource_blocking import ResourceBlocker
+            self.blocker = ResourceBlocker()
+        self._open_context()
         print("Browser ready!\n")
+
+    def _open_context(self):
+        # locale en-US so Maps shows English labels ('Overview','Menu','Reviews','About')
+        self.context = self.browser.new_context(locale="en-US", extra_http_headers={"Accept-Language": "en-US,en;q=0.9"},
+                                                **self.context_options)
+        if self.blocker:
+            self.context.route("**/*", self.blocker.handle)
+        if self.replay_har:
+            # Offline: anything the recording does not have is aborted, never fetched
+            self.context.route_from_har(self.replay_har, not_found="abort")
+        self.page = self.context.new_page()
+        if self.blocker:
+            self.page.on("response", self.blocker.on_response)
+
+    def recycle_context(self):
+        """Replace the context and page; frees renderer memory without restarting the browser."""
+        try:
+            self.context.close()
+        except: pass
+        self._open_context()
+
+    def browser_alive(self):
+        try:
+            return bool(self.browser and self.browser.is_connected() and not self.page.is_closed())
+        except Exception:
+            return False
+
+    def restart_browser(self):
+        self.close_browser()
+        self.start_browser(**self.launch_options)
         
     def close_browser(self):
+        if self.context:
+            try:
+                self.context.close()
+            except: pass
         if self.browser:
-            self.browser.close()
+            try:
+                self.browser.close()
+            except: pass
         if self.playwright:
             self.playwright.stop()
+        self.context = self.page = self.browser = self.playwright = None
+
+    @contextmanager
+    def _cafe_timing(self, name, mode):
+        """Time one cafe; nested calls (delta falling back to scrape_place) share the outer timer."""
+        if not self.metrics or self._timer:
+            yield None
+            return
+        self._timer = self.metrics.start_cafe(name, mode)
+        try:
+            yield self._timer
+        finally:
+            timer, self._timer = self._timer, None
+            self.metrics.finish_cafe(timer)
+
+    def _phase(self, name):
+        return self._timer.phase(name) if self._timer else nullcontext()
+
+    def _count(self, key, n):
+        if self._timer:
+            self._timer.count(key, n)
 
     def determine_region_file(self, address):
         addr = address.lower()
@@ -63,13 +266,10 @@ class CafeScraper:
                 return vide_file
         return "cafe_data_Sleman.json"
 
-    def already_exists(self, name, region_file):
-        if not os.path.exists(region_file): return False
+    def already_exists(self, name, region_file, link=None):
+        # Index is built once per store and updated on every save_record
         try:
-            with open(region_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                names = {entry.get('name', '').lower().strip() for entry in data}
-                return name.lower().strip() in names
+            return self.store(region_file).contains(name, link)
         except:
             return False
 
@@ -78,45 +278,7 @@ class CafeScraper:
     def extract_basic_info(self):
         info = {}
         try:
-            # Name
-            if self.page.locator("h1.DUwDvf").count() > 0:
-                info['name'] = self.page.locator("h1.DUwDvf").first.inner_text()
-            else:
-                info['name'] = ""
-            
-            # Address
-            address = "N/A"
-            if self.page.locator("button[data-item-id='address']").count() > 0:
-                raw = self.page.locator("button[data-item-id='address']").get_attribute("aria-label") or ""
-                address = raw.replace("Address: ", "").replace("Alamat: ", "").strip()
-            info['address'] = address
-            
-            # Rating and Reviews Count
-            rating = "N/A"
-            reviews_count = "N/A"
-            if self.page.locator(".F7nice").count() > 0:
-                rating_text = self.page.locator(".F7nice").first.inner_text()
-                parts = rating_text.split("(")
-                if len(parts) > 0:
-                    rating = parts[0].strip()
-                if len(parts) > 1:
-                    reviews_count = parts[1].replace(")", "").strip()
-            info['rating'] = rating
-            info['reviews_count'] = reviews_count
-            
-            # Category
-            category = "Cafe"
-            if self.page.locator("button.DkEaL").count() > 0:
-                category = self.page.locator("button.DkEaL").first.inner_text()
-            info['category'] = category
-            
-            # Phone
-            phone = "N/A"
-            if self.page.locator("button[data-item-id^='phone:']").count() > 0:
-                phone_aria = self.page.locator("button[data-item-id^='phone:']").get_attribute("aria-label") or ""
-                phone = phone_aria.replace("Phone: ", "").replace("Telepon: ", "").strip()
-            info['phone'] = phone
-            
+            info = parse_basic_info(self.page.evaluate(BASIC_INFO_JS))
         except Exception as e:
             print(f"      ERROR extracting basic info: {e}")
         return info
@@ -135,41 +297,69 @@ class CafeScraper:
                             break
                         except: continue
 
-            if self.page.locator("table.eK4R0e").count() > 0:
-                rows = self.page.locator("table.eK4R0e tr").all()
-                for row in rows:
-                    text = row.inner_text().strip().replace("\n", " ")
-                    if len(text) > 3:
-                        opening_hours.append(text)
+            opening_hours = parse_hour_rows(self.page.evaluate(HOURS_JS))
         except Exception as e:
             print(f"      ERROR extracting hours: {e}")
         return opening_hours
 
+    def read_photo_count(self):
+        """Photo count badge on the place page, or None when Maps does not show one."""
+        try:
+            return parse_photo_count(self.page.evaluate(PHOTO_COUNT_JS))
+        except Exception:
+            return None
+
     def get_hd_image_url(self, url):
-        if not url or "googleusercontent.com" not in url: return url
-        if "=" in url:
-            return f"{url.split('=')[0]}=s0"
-        return url
+        return get_hd_image_url(url)
 
-    def _scroll_gallery_panel(self, max_scrolls=60):
-        """Scroll the thumbnail panel until no more content is added or max reached."""
+    def _wait_for_count_growth(self, selector, previous, timeout, fixed_sleep, page=None):
+        """Wait until more than `previous` elements match selector; False on timeout."""
+        t0 = time.time()
         try:
-            selector = '.m6QErb.DxyBCb'
-            last_count = 0
+            (page or self.page).wait_for_function(COUNT_GREW_JS, arg=[selector, previous],
+                                        timeout=timeout * 1000, polling=100)
+            grew = True
+        except Exception:
+            grew = False
+        self.wait_savings.add(fixed_sleep, time.time() - t0)
+        return grew
+
+    def _tiles_all_known(self, start, known, page=None):
+        """True when the tiles loaded from index `start` on form a full batch of known photos."""
+        urls = (page or self.page).evaluate(TILE_URLS_SINCE_JS, [GALLERY_TILE, start])
+        return len(urls) >= KNOWN_SCREEN_TILES and all(self.get_hd_image_url(u) in known for u in urls)
+
+    def _scroll_gallery_panel(self, max_scrolls=60, known=None):
+        """
+        Scroll the thumbnail panel until no more content is added or max reached.
+        With `known` photo URLs, stop as soon as a newly loaded screenful is entirely
+        known: the gallery lists newest photos first, so the rest is already stored.
+        """
+        try:
+            last_count = self.page.locator(GALLERY_TILE).count()
             no_change_count = 0
+            if known and self._tiles_all_known(0, known):
+                print("      First screen already known — no new photos")
+                return
             
             for i in range(max_scrolls):
-                # Scroll
-                self.page.evaluate(f"document.querySelector('{selector}').scrollTop += 5000")
-                time.sleep(1.2) # Increased sleep for slow network
+                # Scroll, then continue as soon as new tiles render
+                self.page.evaluate(f"document.querySelector('{GALLERY_PANEL}').scrollTop += 5000")
+                self._wait_for_count_growth(GALLERY_TILE, last_count, GALLERY_GROWTH_TIMEOUT, GALLERY_SCROLL_SLEEP)
                 
                 # Check for new items
-                current_count = self.page.locator(f"{selector} div[style*='background-image']").count()
+                current_count = self.page.locator(GALLERY_TILE).count()
                 if current_count == last_count:
                     no_change_count += 1
-                    if no_change_count >= 5: break # Be more patient (5 scrolls)
+                    if no_change_count >= GALLERY_NO_CHANGE_ROUNDS:
+                        # The fixed loop needed 5 empty rounds before giving up
+                        self.wait_savings.skip((5 - GALLERY_NO_CHANGE_ROUNDS) * GALLERY_SCROLL_SLEEP)
+                        break
                 else:
                     no_change_count = 0
+                    if known and self._tiles_all_known(last_count, known):
+                        print(f"      Reached known photos after {i+1} scrolls ({current_count} tiles)")
+                        break
                 last_count = current_count
                 
                 if (i+1) % 5 == 0:
@@ -177,35 +367,144 @@ class CafeScraper:
         except Exception as e:
             print(f"      scroll warning: {e}")
 
-    def _extract_images_from_dom(self):
+    def _extract_images_from_dom(self, img_marker="googleusercontent"):
         """Extract all googleusercontent images (bg-image divs + img tags) from current DOM."""
-        imgs = set()
-        # Background-image divs (thumbnail tiles)
-        els = self.page.locator("div[style*='background-image']").all()
-        for el in els:
-            try:
-                bg = el.get_attribute("style") or ""
-                if 'url("' in bg:
-                    url = bg.split('url("')[1].split('")')[0]
-                    if "googleusercontent.com" in url:
-                        imgs.add(self.get_hd_image_url(url))
-            except: pass
-        # img tags (full-size viewer and thumbnails)
-        img_els = self.page.locator("img[src*='googleusercontent']").all()
-        for img in img_els:
+        urls = self.page.evaluate(IMAGE_URLS_JS, img_marker)
+        return {self.get_hd_image_url(u) for u in urls if "googleusercontent.com" in u}
+
+    def _start_image_capture(self):
+        """Listen for place photo responses while the gallery scrolls. Returns the handler."""
+        self._captured_images = set()
+        # Thumbnails already in the memory cache would not hit the network again when a chip is opened
+        self._capture_cdp = None
+        try:
+            self._capture_cdp = self.context.new_cdp_session(self.page)
+            self._capture_cdp.send("Network.setCacheDisabled", {"cacheDisabled": True})
+        except Exception as e:
+            print(f"      cache disable warning: {e}")
+
+        def on_response(response):
             try:
-                src = img.get_attribute("src") or ""
-                if "googleusercontent.com" in src:
-                    imgs.add(self.get_hd_image_url(src))
+                if response.request.resource_type == "image" and is_place_photo_url(response.url):
+                    self._captured_images.add(self.get_hd_image_url(response.url))
             except: pass
+
+        self.page.on("response", on_response)
+        return on_response
+
+    def _stop_image_capture(self, handler):
+        try:
+            self.page.remove_listener("response", handler)
+            if self._capture_cdp:
+                self._capture_cdp.send("Network.setCacheDisabled", {"cacheDisabled": False})
+                self._capture_cdp.detach()
+        except: pass
+
+    def _take_captured_images(self):
+        imgs = self._captured_images
+        self._captured_images = set()
         return imgs
 
-    def _open_gallery_and_get_all(self):
+    def _collect_gallery_images(self):
+        """Images for the current gallery view: captured responses, or a DOM walk."""
+        if self.capture_network_images:
+            return self._take_captured_images()
+        return self._extract_images_from_dom()
+
+    def _open_place_in_sibling(self):
+        """
+        New page in the same context with the place page navigation started (not awaited).
+        The caller opens the gallery and clicks the chip once it has loaded.
+        """
+        page = self.context.new_page()
+        try:
+            page.goto(self._place_url, timeout=30000, wait_until="commit")
+        except Exception:
+            page.close()
+            raise
+        return page
+
+    def _gather_menu_chips_parallel(self, chip_texts, known=None, max_scrolls=20):
+        """
+        Open each menu-related chip in a sibling page and scroll them round-robin, so the
+        tiles of all chips load concurrently. Returns the union of their image URLs.
+        """
+        images = set()
+        pages = []
+        try:
+            # Start every navigation first; they load in parallel
+            for text in chip_texts:
+                try:
+                    pages.append((self._open_place_in_sibling(), text))
+                except Exception as e:
+                    print(f"      [Parallel chips] could not open '{text}': {e}")
+
+            active = []
+            for page, text in pages:
+                try:
+                    page.wait_for_selector("button.aoRNLd", timeout=15000)
+                    page.locator("button.aoRNLd").first.click(timeout=10000)
+                    page.wait_for_selector("button.hh2c6", timeout=8000)
+                    # "Menu" must not also click "Menu Minuman"
+                    page.locator("button.hh2c6", has_text=whole_text(text)).first.click(timeout=3000)
+                    active.append({'page': page, 'text': text, 'count': 0, 'idle': 0})
+                except Exception as e:
+                    print(f"      [Parallel chips] '{text}' did not open: {e}")
+            # The pages loaded concurrently, so the first tiles are usually there already.
+            # Only the first wait stands in for the old 2 s sleep; the others overlapped it.
+            for a in active:
+                self._wait_for_count_growth(GALLERY_TILE, 0, GALLERY_GROWTH_TIMEOUT, 2 if a is active[0] else 0,
+                                            a['page'])
+
+            for _ in range(max_scrolls):
+                if not active:
+                    break
+                for a in active:
+                    a['page'].evaluate(f"document.querySelector('{GALLERY_PANEL}').scrollTop += 5000")
+                # One shared deadline covers every page's network: pages that grew while an
+                # earlier one was waited on return at once, idle ones only get what is left
+                deadline = time.time() + GALLERY_GROWTH_TIMEOUT
+                for a in active:
+                    self._wait_for_count_growth(GALLERY_TILE, a['count'], max(deadline - time.time(), 0.05),
+                                                GALLERY_SCROLL_SLEEP if a is active[0] else 0, a['page'])
+                still_active = []
+                for a in active:
+                    count = a['page'].locator(GALLERY_TILE).count()
+                    if count == a['count']:
+                        a['idle'] += 1
+                    else:
+                        a['idle'] = 0
+                        if known and self._tiles_all_known(a['count'], known, a['page']):
+                            a['idle'] = GALLERY_NO_CHANGE_ROUNDS
+                    a['count'] = count
+                    if a['idle'] < GALLERY_NO_CHANGE_ROUNDS:
+                        still_active.append(a)
+                active = still_active
+
+            for page, text in pages:
+                try:
+                    urls = page.evaluate(IMAGE_URLS_JS, "googleusercontent")
+                    chunk = {self.get_hd_image_url(u) for u in urls if "googleusercontent.com" in u}
+                    images.update(chunk)
+                    print(f"      [Parallel chips] '{text}': {len(chunk)} images")
+                except Exception as e:
+                    print(f"      [Parallel chips] '{text}' extract failed: {e}")
+        finally:
+            for page, _ in pages:
+                try:
+                    page.close()
+                except: pass
+        return images
+
+    def _open_gallery_and_get_all(self, known=None):
         """
         Opens the photo gallery and returns:
         { 'all': set_of_cafe_photo_urls, 'menu': set_of_menu_photo_urls }
+        known ({'all': set, 'menu': set}) enables incremental scans that stop at stored photos.
         """
+        known = known or {}
         result = {'all': set(), 'menu': set()}
+        capture = None
         try:
             photo_btn = self.page.locator("button.aoRNLd").first
             if photo_btn.count() == 0:
@@ -213,6 +512,8 @@ class CafeScraper:
                 result['all'].update(self._extract_images_from_dom())
                 return result
 
+            if self.capture_network_images:
+                capture = self._start_image_capture()
             photo_btn.click(timeout=10000)
 
             # Wait for gallery chips to appear (confirms gallery is open)
@@ -246,26 +547,35 @@ class CafeScraper:
             print(f"      Gallery chips: {chip_texts}")
 
             # --- Step 1: Collect ALL cafe photos ---
-            self._scroll_gallery_panel(max_scrolls=40)
-            result['all'].update(self._extract_images_from_dom())
+            self._scroll_gallery_panel(max_scrolls=40, known=known.get('all'))
+            result['all'].update(self._collect_gallery_images())
             print(f"      [Gallery All] Final: {len(result['all'])} images")
 
             # --- Step 2: Collect Menu & Food photos ---
             menu_related_chips = []
+            menu_chip_texts = []
             for c in chips:
                 try:
-                    t = c.inner_text().strip().lower()
-                    if any(x in t for x in ('menu', 'food', 'makanan', 'minuman', 'drink')):
+                    t = c.inner_text().strip()
+                    if any(x in t.lower() for x in MENU_CHIP_KEYWORDS):
                         menu_related_chips.append(c)
+                        menu_chip_texts.append(t)
                 except: pass
             
             print(f"      Found {len(menu_related_chips)} menu-related chips.")
+            self._count('chips', len(chips))
+            self._count('menu_chips', len(menu_related_chips))
+            if self.parallel_menu_chips and len(menu_chip_texts) > 1 and self._place_url:
+                result['menu'].update(self._gather_menu_chips_parallel(menu_chip_texts, known.get('menu')))
+                print(f"      [Gallery Menu-Related] Parallel total: {len(result['menu'])} images")
+                menu_related_chips = []
             for chip in menu_related_chips:
                 try:
+                    self._take_captured_images()
                     chip.click(timeout=3000)
                     time.sleep(2)
-                    self._scroll_gallery_panel(max_scrolls=20)
-                    chunk = self._extract_images_from_dom()
+                    self._scroll_gallery_panel(max_scrolls=20, known=known.get('menu'))
+                    chunk = self._collect_gallery_images()
                     result['menu'].update(chunk)
                     print(f"      [Gallery Menu-Related] Current menu total: {len(result['menu'])} images")
                 except: pass
@@ -280,9 +590,36 @@ class CafeScraper:
                 self.page.keyboard.press("Escape")
                 time.sleep(1)
             except: pass
+        finally:
+            if capture:
+                self._stop_image_capture(capture)
         return result
 
 
+    def _collect_photos_and_menu(self, data, existing=None):
+        """
+        Fill data['photos'] and data['menu'] from one gallery pass. With an existing record
+        the scan is incremental and new photos are merged into the stored lists.
+        """
+        stored_menu = existing.get('menu') if existing and isinstance(existing.get('menu'), dict) else {}
+        known = None
+        if existing:
+            known = {'all': set(existing.get('photos') or []), 'menu': set(stored_menu.get('images') or [])}
+
+        # Open gallery ONCE — collect all cafe photos + menu photos in one pass
+        with self._phase('gallery'):
+            self._gallery_cache = self._open_gallery_and_get_all(known)
+        data['photos'] = self.extract_cafe_images()
+        with self._phase('menu'):
+            data['menu'] = self.extract_menu_images()
+        self._count('tiles', len(data['photos']))
+        self._count('menu_images', len(data['menu'].get('images', [])))
+        if existing:
+            fresh = len(data['photos'])
+            data['photos'] = merge_photo_lists(data['photos'], existing.get('photos'))
+            data['menu']['images'] = merge_photo_lists(data['menu']['images'], stored_menu.get('images'))
+            print(f"      Merged photos: {fresh} scanned, {len(data['photos'])} total")
+
     def extract_cafe_images(self):
         """Extracts ALL cafe photos (including env, interior, food) from the gallery."""
         # Gallery is shared with menu, so we open once in scrape_cafe_page
@@ -331,23 +668,7 @@ class CafeScraper:
                     self.page.mouse.wheel(0, 1000)
                     time.sleep(0.5)
 
-                elements = self.page.locator("div[style*='background-image']").all()
-                for el in elements:
-                    try:
-                        bg = el.get_attribute("style") or ""
-                        if 'url("' in bg:
-                            src = bg.split('url("')[1].split('")')[0]
-                            if "googleusercontent.com" in src:
-                                image_urls.add(self.get_hd_image_url(src))
-                    except: pass
-
-                img_els = self.page.locator("img").all()
-                for img in img_els:
-                    try:
-                        src = img.get_attribute("src") or ""
-                        if "googleusercontent.com" in src and "p/AF1Qip" in src:
-                            image_urls.add(self.get_hd_image_url(src))
-                    except: pass
+                image_urls.update(self._extract_images_from_dom(img_marker="p/AF1Qip"))
 
                 print(f"      [Menu sidebar tab] {len(image_urls)} total images")
 
@@ -382,11 +703,18 @@ class CafeScraper:
                     rev_tab.click()
                     time.sleep(2)
 
-            # Scroll to load more reviews
+            # Scroll to load more reviews, stopping once enough have rendered
             print("      Scrolling reviews...")
-            for i in range(8):
-                self.page.evaluate("document.querySelector('.m6QErb.DxyBCb').scrollTop += 3000")
-                time.sleep(1.5)
+            last_count = self.page.locator(REVIEW_BLOCK).count()
+            for i in range(REVIEW_SCROLLS):
+                if last_count >= REVIEW_TARGET:
+                    self.wait_savings.skip((REVIEW_SCROLLS - i) * REVIEW_SCROLL_SLEEP)
+                    break
+                self.page.evaluate(f"document.querySelector('{GALLERY_PANEL}').scrollTop += 3000")
+                if not self._wait_for_count_growth(REVIEW_BLOCK, last_count, REVIEW_GROWTH_TIMEOUT, REVIEW_SCROLL_SLEEP):
+                    self.wait_savings.skip((REVIEW_SCROLLS - i - 1) * REVIEW_SCROLL_SLEEP)
+                    break
+                last_count = self.page.locator(REVIEW_BLOCK).count()
                 if (i+1) % 4 == 0:
                     print(f"      Review scroll {i+1}...")
 
@@ -401,103 +729,250 @@ class CafeScraper:
             """)
             time.sleep(1.5)
 
-            review_blocks = self.page.locator("div.jftiEf").all()
-            for i, block in enumerate(review_blocks):
-                if i >= 10: break # Get top 10 reviews
-                try:
-                    # Author
-                    author = "N/A"
-                    if block.locator(".d4r55").count() > 0:
-                        author = block.locator(".d4r55").first.inner_text()
-                    
-                    # Rating - Trying multiple confirmed Maps classes
-                    rating = "N/A"
-                    for cls in ["span.kvqyne", "span.kvMYIc", "span.kvMY6c"]:
-                        stars_el = block.locator(cls).first
-                        if stars_el.count() > 0:
-                            rating_aria = stars_el.get_attribute("aria-label")
-                            if rating_aria:
-                                rating = rating_aria.split()[0]
-                                break
-                    
-                    # Text
-                    text = ""
-                    if block.locator(".wiI7pd").count() > 0:
-                        text = block.locator(".wiI7pd").first.inner_text()
-                    
-                    reviews.append({
-                        "author": author,
-                        "rating": rating,
-                        "text": text
-                    })
-                except: continue
+            reviews = parse_reviews(self.page.evaluate(REVIEWS_JS, REVIEW_TARGET))
             print(f"      Scraped {len(reviews)} reviews.")
+            print(f"      Waits so far: {self.wait_savings.summary()}")
         except Exception as e:
             print(f"      ERROR reviews: {e}")
         return reviews
 
-    def scrape_cafe_page(self, url):
+    def scrape_cafe_page(self, url, existing=None):
+        """existing: the stored record, if any — enables the incremental gallery scan."""
+        self.last_skip = None
+        stage = 'load'
         try:
             print("  → Loading data...")
-            self.page.goto(url, timeout=30000)
-            self.page.wait_for_selector("h1.DUwDvf", timeout=10000)
-            time.sleep(2)
+            if self.blocker:
+                self.blocker.reset()
+            with self._phase('goto'):
+                self.page.goto(url, timeout=30000)
+                stage = 'place'
+                self.page.wait_for_selector("h1.DUwDvf", timeout=10000)
+                self._place_url = url
+                time.sleep(2)
+            stage = 'extract'
             
-            data = self.extract_basic_info()
+            with self._phase('basic_info'):
+                data = self.extract_basic_info()
             
-            # Filter non-cafe entries (allowed: cafe, coffee, kopi, kedai, resto, etc.)
-            allowed_cats = ['cafe', 'kafe', 'coffee', 'kopi', 'kedai', 'roaster', 'bakery', 'tea', 'boba',
-                            'dessert', 'beverage', 'minuman', 'restaurant', 'restoran', 'warung kopi',
-                            'espresso']
-            cat_lower = data.get('category', '').lower()
-            if not any(keyword in cat_lower for keyword in allowed_cats):
+            if not is_cafe_category(data.get('category')):
                 print(f"      Skipping non-cafe category: '{data.get('category')}'")
+                self.last_skip = f"non-cafe category: {data.get('category')}"
                 return None
             
             data['link'] = url
-            data['opening_hours'] = self.extract_opening_hours()
-            
-            # Open gallery ONCE — collect all cafe photos + menu photos in one pass
-            self._gallery_cache = self._open_gallery_and_get_all()
+            data['scraped_at'] = datetime.now().isoformat(timespec='seconds')
+            with self._phase('photo_count'):
+                photos_count = self.read_photo_count()
+            if photos_count is not None:
+                data['photos_count'] = photos_count
+            with self._phase('opening_hours'):
+                data['opening_hours'] = self.extract_opening_hours()
             
-            data['photos'] = self.extract_cafe_images()
-            data['menu'] = self.extract_menu_images()
-            data['customer_reviews'] = self.extract_customer_reviews()
+            self._collect_photos_and_menu(data, existing)
+            with self._phase('reviews'):
+                data['customer_reviews'] = self.extract_customer_reviews()
+            self._count('reviews', len(data['customer_reviews']))
+            if self.blocker:
+                print(f"      [fast mode] {self.blocker.page_summary()}")
             return data
         except Exception as e:
             print(f"  ✗ Error scraping page: {e}")
+            self._note_failure(e, stage)
             return None
 
-    def scrape_direct(self, name, address):
+    def _note_failure(self, error=None, stage=None):
+        """
+        Classify a failed page into last_failure, and put a captcha/consent interstitial
+        or a timeout into last_signal for the rate limiter.
+        """
+        signal = None
+        try:
+            signal = block_signal_for_url(self.page.url)
+        except Exception:
+            pass
+        self.last_failure = classify_failure(error, stage, blocked=bool(signal))
+        if not signal and isinstance(error, PlaywrightTimeoutError):
+            signal = TIMEOUT
+        if signal:
+            self.last_signal = signal
+
+    def scrape_direct(self, name, address, existing=None):
         """Use direct search URL"""
         print(f"    🔍 Searching: {name}...")
+        self.last_skip = None
         query = f"{name} {address}"
         encoded = requests.utils.quote(query) if 'requests' in sys.modules else query.replace(" ", "+")
         url = f"https://www.google.com/maps/search/{encoded}"
         
         try:
-            self.page.goto(url, timeout=30000)
-            time.sleep(2)
-            
-            # Click first result if list view
-            if "search" in self.page.url:
-                 try:
-                    self.page.wait_for_selector("a[href*='/maps/place/']", timeout=5000)
-                    self.page.locator("a[href*='/maps/place/']").first.click()
-                    time.sleep(2)
-                 except: pass
+            with self._phase('search'):
+                self.page.goto(url, timeout=30000)
+                time.sleep(2)
+                
+                # Click first result if list view
+                if "search" in self.page.url:
+                     try:
+                        self.page.wait_for_selector("a[href*='/maps/place/']", timeout=5000)
+                        self.page.locator("a[href*='/maps/place/']").first.click()
+                        time.sleep(2)
+                     except: pass
 
             try:
-                self.page.wait_for_selector("h1.DUwDvf", timeout=5000)
-                return self.scrape_cafe_page(self.page.url)
-            except:
+                with self._phase('search'):
+                    self.page.wait_for_selector("h1.DUwDvf", timeout=5000)
+            except Exception as e:
+                self._note_failure(e)
+                if self.last_failure not in (NETWORK, BROWSER, BLOCKED):
+                    # The search page loaded but did not lead to a place: an ordinary miss,
+                    # not a slow page, so the rate limiter must not back off for it
+                    self.last_failure = NOT_FOUND
+                    self.last_signal = None
                 return None
+            return self.scrape_cafe_page(self.page.url, existing)
                 
         except Exception as e:
             print(f"      ✗ Search error: {e}")
+            self._note_failure(e, 'load')
             return None
 
-    def run(self):
+    def store(self, region_file):
+        if region_file not in self.stores:
+            self.stores[region_file] = RecordStore(region_file)
+        return self.stores[region_file]
+
+    def scrape_delta(self, existing):
+        """
+        Refresh a stored record, running only the expensive extractors whose inputs changed:
+        reviews when reviews_count/rating moved, gallery + menu when the photo badge moved.
+        Records without a place link get a full scrape_place.
+        """
+        self.last_signal = None
+        self.last_failure = None
+        with self._cafe_timing(existing.get('name'), "delta") as timer:
+            data = self._scrape_delta(existing)
+            if timer:
+                timer.set_outcome(*self.outcome_status(data))
+            return data
+
+    def _scrape_delta(self, existing):
+        link = existing.get('link')
+        if not link or "/maps/place/" not in link:
+            return self.scrape_place(existing.get('name'), existing.get('address', ''), link, existing)
+
+        self.last_skip = None
+        stage = 'load'
+        try:
+            print("  → Loading data (delta)...")
+            if self.blocker:
+                self.blocker.reset()
+            with self._phase('goto'):
+                self.page.goto(link, timeout=30000)
+                stage = 'place'
+                self.page.wait_for_selector("h1.DUwDvf", timeout=10000)
+                self._place_url = link
+                time.sleep(2)
+            stage = 'extract'
+
+            with self._phase('basic_info'):
+                info = self.extract_basic_info()
+            if not is_cafe_category(info.get('category')):
+                print(f"      Skipping non-cafe category: '{info.get('category')}'")
+                self.last_skip = f"non-cafe category: {info.get('category')}"
+                return None
+
+            data = dict(existing)
+            data.update({k: v for k, v in info.items() if v not in ("", "N/A")})
+            data['scraped_at'] = datetime.now().isoformat(timespec='seconds')
+            with self._phase('photo_count'):
+                photos_count = self.read_photo_count()
+
+            reviews_changed = (info.get('reviews_count') != existing.get('reviews_count')
+                               or info.get('rating') != existing.get('rating'))
+            if not existing.get('photos'):
+                photos_changed = True
+            elif photos_count is None:
+                photos_changed = reviews_changed
+            else:
+                # Records scraped before photos_count existed take the current badge as baseline
+                photos_changed = existing.get('photos_count', photos_count) != photos_count
+            if photos_count is not None:
+                data['photos_count'] = photos_count
+
+            refreshed = []
+            if not existing.get('opening_hours'):
+                with self._phase('opening_hours'):
+                    data['opening_hours'] = self.extract_opening_hours()
+                refreshed.append('opening_hours')
+            if photos_changed:
+                self._collect_photos_and_menu(data, existing)
+                refreshed += ['photos', 'menu']
+            if reviews_changed or not existing.get('customer_reviews'):
+                with self._phase('reviews'):
+                    data['customer_reviews'] = self.extract_customer_reviews()
+                self._count('reviews', len(data['customer_reviews']))
+                refreshed.append('customer_reviews')
+            print(f"      Delta refresh: {', '.join(refreshed) or 'basic info only'}")
+            return data
+        except Exception as e:
+            print(f"  ✗ Error in delta scrape: {e}")
+            self._note_failure(e, stage)
+            return None
+
+    def scrape_place(self, name, address, link=None, existing=None):
+        """
+        Go straight to a stored place link, skipping the search step.
+        Falls back to scrape_direct (search + first result) when the link does not load.
+        """
+        self.last_signal = None
+        self.last_failure = None
+        with self._cafe_timing(name, "full") as timer:
+            data = self._scrape_place(name, address, link, existing)
+            if timer:
+                timer.set_outcome(*self.outcome_status(data))
+            return data
+
+    def _scrape_place(self, name, address, link=None, existing=None):
+        if link and "/maps/place/" in link:
+            print(f"    📍 Direct link: {name}...")
+            data = self.scrape_cafe_page(link, existing)
+            # A captcha/consent wall would only be hit again by the search
+            if data or self.last_skip or self.last_signal in BLOCK_SIGNALS:
+                return data
+            print("      Direct link failed — falling back to search")
+            # The search reports its own outcome; a stale timeout would slow the limiter after a success
+            self.last_signal = None
+            self.last_failure = None
+        return self.scrape_direct(name, address, existing)
+
+    def save_record(self, data, region_file, replace_name=None):
+        """
+        Append the cafe to region_file's log. compact_stores() later replaces the
+        cafe with the same name in region_file, or appends it.
+        """
+        self.store(region_file).append(data, replace_name)
+        print(f"  💾 Logged {data.get('name')} for {region_file}")
+
+    def compact_stores(self):
+        """Fold pending logs (including ones left by a crashed run) into the region files."""
+        for region_file in sorted(set(self.region_mapping.values()) | set(self.stores)):
+            self.store(region_file).compact()
+
+    def outcome_status(self, data):
+        """Journal status for the result of the last scrape_place/scrape_direct/scrape_cafe_page call."""
+        if data:
+            return DONE, None
+        if self.last_skip:
+            return SKIPPED, self.last_skip
+        return FAILED, self.last_failure or NOT_FOUND
+
+    def run(self, block_resources=False, journal_path=None, retry_failed=False, skip_existing=False,
+            limiter=None, **lifecycle_options):
+        """
+        limiter paces the cafes (an AdaptiveRateLimiter at the default rate if not given);
+        lifecycle_options go to BrowserLifecycle (recycle_every, max_rss_mb, task_timeout).
+        """
+        limiter = limiter or AdaptiveRateLimiter()
         if not os.path.exists(self.input_file):
             print(f"Input file {self.input_file} not found.")
             return
@@ -506,47 +981,87 @@ class CafeScraper:
             tasks = json.load(f)
             
         print(f"loaded {len(tasks)} cafes from list.")
-        self.start_browser()
+        journal = ScrapeJournal(journal_path or default_journal_path(self.input_file))
+        self.compact_stores()
+        self.start_browser(block_resources=block_resources)
+        lifecycle = BrowserLifecycle(self, **lifecycle_options)
         
         added = 0
+        resumed = 0
+        runnable = []
         for i, task in enumerate(tasks):
-            name = task.get('name')
-            address = task.get('address', '')
-            region_file = self.determine_region_file(address)
-            
-            # Force update, bypass SKIP logic:
-            # if self.already_exists(name, region_file):
-            #     print(f"[{i+1}] SKIP: {name}")
-            #     continue
-                
-            print(f"\n[{i+1}] Processing: {name}")
-            data = self.scrape_direct(name, address)
-            
-            if data:
-                # Load, Append, Save
-                if os.path.exists(region_file):
-                    with open(region_file, 'r', encoding='utf-8') as f:
-                        current = json.load(f)
-                else: current = []
-                
-                existing_idx = next((index for index, d in enumerate(current) if d.get('name') == data.get('name')), None)
-                if existing_idx is not None:
-                    current[existing_idx] = data
-                    print(f"  💾 Updated {name} in {region_file}")
-                else:
-                    current.append(data)
-                    print(f"  💾 Saved new {name} to {region_file}")
+            # Force update by default; --skip-existing restores the SKIP logic
+            if skip_existing and self.already_exists(task.get('name'), self.determine_region_file(task.get('address', '')), task.get('link')):
+                print(f"[{i+1}] SKIP: {task.get('name')}")
+                continue
+            if not journal.should_run(task_key(task.get('name'), task.get('address', '')), retry_failed):
+                resumed += 1
+                continue
+            runnable.append((i, task))
+        # Transient failures come back after a backoff; the rest end up in the dead-letter list
+        pending = RetryQueue(runnable)
+        failures = FailureTracker(dead_letter_path(journal.path))
+        try:
+            while True:
+                item = pending.next()
+                if item is None:
+                    break
+                (i, task), attempt = item
+                name = task.get('name')
+                address = task.get('address', '')
+                region_file = self.determine_region_file(address)
+                key = task_key(name, address)
+                    
+                print(f"\n[{i+1}] Processing: {name}" + (f" (attempt {attempt})" if attempt > 1 else ""))
+                limiter.acquire()
+                t0 = time.time()
+                data = lifecycle.scrape(self.scrape_place, name, address, task.get('link'))
+                limiter.report(self.last_signal, time.time() - t0)
                 
-                with open(region_file, 'w', encoding='utf-8') as f:
-                    json.dump(current, f, indent=4, ensure_ascii=False)
-                added += 1
-            else:
-                print("  ✗ Not found")
-            time.sleep(1)
-            
-        self.close_browser()
-        print(f"\nDone. Added {added} new cafes.")
+                status, reason = self.outcome_status(data)
+                if data:
+                    self.save_record(data, region_file)
+                    added += 1
+                elif status == FAILED:
+                    print(f"  ✗ Failed: {reason}")
+                    if failures.retry_or_dead_letter(pending, (i, task), task, reason, attempt):
+                        continue
+                journal.record(key, status, reason)
+        finally:
+            lifecycle.close()
+            self.close_browser()
+            self.compact_stores()
+        print(f"\nDone. Added {added} new cafes ({resumed} already handled per {journal.path}).")
+        print(f"Adaptive waits: {self.wait_savings.summary()}")
+        print(f"Browser lifecycle: {lifecycle.summary()}")
+        print(f"Rate limiter: {limiter.summary()}")
+        print(f"Failures: {failures.summary()}")
+        # A full pass finished; the next run starts with only the failed entries (same rule as run_batch)
+        print(f"Archived journal to {journal.archive()}")
 
 if __name__ == "__main__":
-    scraper = CafeScraper()
-    scraper.run()
+    parser = argparse.ArgumentParser(description="Scrape cafes from consolidated_list.json")
+    parser.add_argument("--input", default="consolidated_list.json")
+    parser.add_argument("--network-images", action="store_true",
+                        help="collect gallery photos from network responses instead of the DOM")
+    parser.add_argument("--fast", action="store_true",
+                        help="block fonts, map tiles, analytics and non-photo images")
+    parser.add_argument("--parallel-chips", action="store_true",
+                        help="scan menu/food/drink gallery chips in sibling pages concurrently")
+    parser.add_argument("--journal", help="checkpoint journal path (default: scrape_journal_<input>.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true", help="only rerun tasks the journal marks as failed")
+    parser.add_argument("--fresh", action="store_true", help="discard the journal and start over")
+    parser.add_argument("--skip-existing", action="store_true", help="skip cafes already in their region file")
+    parser.add_argument("--metrics", help="append per-cafe phase timings to this JSONL file")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE * 60,
+                        help="starting pace in cafes per minute; adapts to clean loads and block signals")
+    add_lifecycle_arguments(parser)
+    args = parser.parse_args()
+    scraper = CafeScraper(args.input, capture_network_images=args.network_images,
+                          parallel_menu_chips=args.parallel_chips,
+                          metrics=ScrapeMetrics(args.metrics) if args.metrics else None)
+    if args.fresh:
+        discard_journal(args.journal or default_journal_path(args.input))
+    scraper.run(block_resources=args.fast, journal_path=args.journal, retry_failed=args.retry_failed,
+                skip_existing=args.skip_existing, limiter=AdaptiveRateLimiter(args.rate / 60),
+                **lifecycle_options(args))
@@ -0,0 +1,223 @@
+"""
+Worker-pool mode for CafeScraper.
+
+One msedge instance is launched with a CDP port. Each worker thread attaches to it
+with its own Playwright connection and works in an isolated browser context,
+pulling cafes from consolidated_list.json. Scraped records go through a queue to a
+single writer thread, so region files are only ever written from one place.
+Transient failures go back on the shared task queue with backoff (failure_policy).
+
+Usage:
+    python scraper_pool.py --workers 4
+    python scraper_pool.py --workers 6 --input consolidated_list.json --headful
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from playwright.sync_api import sync_playwright
+from scraper import CafeScraper
+from scrape_metrics import ScrapeMetrics
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_RATE
+from browser_lifecycle import BrowserLifecycle, DEFAULT_RECYCLE_EVERY
+from scrape_journal import ScrapeJournal, task_key, default_journal_path, discard_journal, DONE, FAILED
+from failure_policy import FailureTracker, RetryQueue, classify_failure, dead_letter_path
+
+DEFAULT_WORKERS = 4
+CDP_PORT = 9333
+
+_DONE = object()
+
+
+class WorkerStats:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.scraped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started = time.time()
+
+    @property
+    def processed(self):
+        return self.scraped + self.failed
+
+    def per_hour(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        return self.processed * 3600 / elapsed
+
+    def line(self):
+        avg = self.busy_seconds / self.processed if self.processed else 0
+        return (f"worker {self.worker_id}: {self.scraped} ok, {self.failed} failed, "
+                f"{avg:.1f}s/cafe, {self.per_hour():.1f} cafes/hour")
+
+
+def _worker(worker_id, tasks, results, stats, cdp_endpoint, block_resources, recycle_every, limiter,
+            failures, scraper_options):
+    scraper = CafeScraper(**scraper_options)
+    try:
+        scraper.start_browser(cdp_endpoint=cdp_endpoint, block_resources=block_resources)
+    except Exception as e:
+        print(f"[w{worker_id}] could not attach to browser: {e}")
+        return
+    # Attached over CDP: the browser is shared, so only this worker's context gets recycled
+    lifecycle = BrowserLifecycle(scraper, recycle_every=recycle_every)
+
+    try:
+        while True:
+            next_item = tasks.next()
+            if next_item is None:
+                break
+            (i, task), attempt = next_item
+            name = task.get('name')
+            address = task.get('address', '')
+            print(f"\n[w{worker_id}] [{i+1}] Processing: {name}" + (f" (attempt {attempt})" if attempt > 1 else ""))
+            limiter.acquire()
+            t0 = time.time()
+            error = None
+            try:
+                data = lifecycle.scrape(scraper.scrape_place, name, address, task.get('link'))
+            except Exception as e:
+                print(f"[w{worker_id}] ! Fatal error processing {name}: {e}")
+                data, error = None, e
+            stats.busy_seconds += time.time() - t0
+            limiter.report(scraper.last_signal, time.time() - t0)
+            status, reason = scraper.outcome_status(data)
+            if error is not None:
+                reason = classify_failure(error, 'extract')
+            if status == FAILED and failures.retry_or_dead_letter(tasks, (i, task), task, reason, attempt):
+                continue
+            if data:
+                stats.scraped += 1
+            else:
+                stats.failed += 1
+                print(f"[w{worker_id}]  ✗ Failed ({reason}): {name}")
+            results.put((task, data, status, reason))
+    finally:
+        print(f"[w{worker_id}] Adaptive waits: {scraper.wait_savings.summary()}")
+        print(f"[w{worker_id}] Browser lifecycle: {lifecycle.summary()}")
+        lifecycle.close()
+        scraper.close_browser()
+
+
+def _writer(results, scraper, journal, saved):
+    """Single consumer: the only thread that touches the region files and the journal."""
+    while True:
+        item = results.get()
+        if item is _DONE:
+            break
+        task, data, status, reason = item
+        key = task_key(task.get('name'), task.get('address', ''))
+        try:
+            if status == DONE:
+                region_file = scraper.determine_region_file(task.get('address', ''))
+                scraper.save_record(data, region_file)
+                saved[0] += 1
+            journal.record(key, status, reason)
+        except Exception as e:
+            print(f"  ! Write error for {task.get('name')}: {e}")
+
+
+def _reporter(stats, stop, interval):
+    while not stop.wait(interval):
+        print("\n--- Pool throughput ---")
+        for s in stats:
+            print(f"  {s.line()}")
+
+
+def run_pool(input_file="consolidated_list.json", workers=DEFAULT_WORKERS, headless=True,
+             report_every=300, block_resources=False, journal_path=None, retry_failed=False,
+             recycle_every=DEFAULT_RECYCLE_EVERY, rate=DEFAULT_RATE, **scraper_options):
+    """rate: starting cafes per second for the whole pool, shared by every worker."""
+    if not os.path.exists(input_file):
+        print(f"Input file {input_file} not found.")
+        return
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        task_list = json.load(f)
+    print(f"loaded {len(task_list)} cafes from list, {workers} workers.")
+
+    journal = ScrapeJournal(journal_path or default_journal_path(input_file))
+    tasks = RetryQueue((i, task) for i, task in enumerate(task_list)
+                       if journal.should_run(task_key(task.get('name'), task.get('address', '')), retry_failed))
+    print(f"{len(tasks)} cafes queued after checking {journal.path}.")
+    failures = FailureTracker(dead_letter_path(journal.path))
+    results = queue.Queue()
+
+    cdp_endpoint = f"http://127.0.0.1:{CDP_PORT}"
+    pw = sync_playwright().start()
+    browser = pw.chromium.launch(channel="msedge", headless=headless,
+                                 args=[f"--remote-debugging-port={CDP_PORT}"])
+
+    started = time.time()
+    saved = [0]
+    writer_scraper = CafeScraper(input_file)
+    writer_scraper.compact_stores()
+    writer = threading.Thread(target=_writer, args=(results, writer_scraper, journal, saved), daemon=True)
+    writer.start()
+
+    limiter = AdaptiveRateLimiter(rate)
+    stats = [WorkerStats(w) for w in range(workers)]
+    threads = [threading.Thread(target=_worker, args=(w, tasks, results, stats[w], cdp_endpoint, block_resources, recycle_every, limiter,
+                                                   failures, scraper_options), daemon=True)
+               for w in range(workers)]
+    stop = threading.Event()
+    reporter = threading.Thread(target=_reporter, args=(stats, stop, report_every), daemon=True)
+    reporter.start()
+
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        stop.set()
+        results.put(_DONE)
+        writer.join()
+        writer_scraper.compact_stores()
+        browser.close()
+        pw.stop()
+
+    elapsed = time.time() - started
+    total = sum(s.processed for s in stats)
+    print("\n=== Pool Summary ===")
+    for s in stats:
+        print(f"  {s.line()}")
+    print(f"Rate limiter: {limiter.summary()}")
+    print(f"Failures: {failures.summary()}")
+    print(f"Saved {saved[0]} cafes, processed {total} in {elapsed/60:.1f} min "
+          f"({total * 3600 / max(elapsed, 1e-6):.1f} cafes/hour overall).")
+    # A full pass finished; the next run starts with only the failed entries (same rule as run_batch).
+    # Tasks still queued mean every worker gave up (e.g. could not attach), so keep the checkpoint.
+    if not len(tasks):
+        print(f"Archived journal to {journal.archive()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape cafes with a pool of browser contexts")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--input", default="consolidated_list.json")
+    parser.add_argument("--headful", action="store_true", help="show the browser window")
+    parser.add_argument("--report-every", type=int, default=300, help="seconds between throughput reports")
+    parser.add_argument("--network-images", action="store_true",
+                        help="collect gallery photos from network responses instead of the DOM")
+    parser.add_argument("--parallel-chips", action="store_true",
+                        help="scan menu/food/drink gallery chips in sibling pages concurrently")
+    parser.add_argument("--fast", action="store_true",
+                        help="block fonts, map tiles, analytics and non-photo images")
+    parser.add_argument("--journal", help="checkpoint journal path (default: scrape_journal_<input>.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true", help="only rerun tasks the journal marks as failed")
+    parser.add_argument("--fresh", action="store_true", help="discard the journal and start over")
+    parser.add_argument("--metrics", help="append per-cafe phase timings to this JSONL file")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE * 60,
+                        help="starting pace for the whole pool in cafes per minute")
+    parser.add_argument("--recycle-every", type=int, default=DEFAULT_RECYCLE_EVERY,
+                        help="replace each worker's browser context after this many cafes (0 = never)")
+    args = parser.parse_args()
+    if args.fresh:
+        discard_journal(args.journal or default_journal_path(args.input))
+    run_pool(args.input, workers=args.workers, headless=not args.headful, report_every=args.report_every,
+             block_resources=args.fast, journal_path=args.journal, retry_failed=args.retry_failed,
+             recycle_every=args.recycle_every, rate=args.rate / 60, capture_network_images=args.network_images, parallel_menu_chips=args.parallel_chips,
+             metrics=ScrapeMetrics(args.metrics) if args.metrics else None)
@@ -0,0 +1,259 @@
+"""
+In-memory search index for the API.
+
+Built once in main.load_data over ALL_CAFES. Every lowercased name and address
+is cut into character trigrams with a postings list of cafe ids per trigram,
+so a query only looks at cafes that contain all of its trigrams before the
+substring check. Postings are in ALL_CAFES order, so results keep file order.
+
+Fuzzy mode works on folded names instead ("Kopi Klothok" -> "kopi klothok",
+accents and punctuation dropped): a fixed number of cafes sharing the most
+trigrams with the query, better rated first on a tie, are the only ones scored
+by edit distance, and the result is ranked by a blend of that text score,
+rating and reviews_count.
+"""
+import re
+import unicodedata
+
+import numpy as np
+
+# Candidate ids intersected at a time by substring search
+SUBSTRING_CHUNK = 4096
+# Cafes scored by edit distance per fuzzy query (at least `limit`); the trigram
+# counts before that cut are numpy work over the query's postings lists
+FUZZY_CANDIDATES = 64
+# Text score below which a cafe is not a match
+FUZZY_MIN_SCORE = 0.6
+WEIGHT_TEXT = 0.7
+WEIGHT_RATING = 0.15
+WEIGHT_REVIEWS = 0.15
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramPostings:
+    """
+    Trigram -> sorted int32 array of text ids, built with numpy over one concatenated
+    buffer instead of a dict append per trigram. Texts are joined with NUL, so trigrams
+    spanning two texts contain a NUL no query has. Characters are renumbered densely so
+    a trigram packs into one integer, and trigram and text id share one int64 sort key.
+    """
+
+    def __init__(self, texts):
+        self.alphabet = {}
+        self.lists = {}
+        joined = "\0".join(texts) + "\0"
+        if len(joined) < 3:
+            return
+        present = sorted(set(joined))
+        self.alphabet = {ch: i for i, ch in enumerate(present)}
+        self.size = size = len(present)
+        if size <= 256:
+            # Usual case: one byte per character, renumbered by str.translate
+            chars = np.frombuffer(joined.translate({ord(ch): i for ch, i in self.alphabet.items()})
+                                  .encode('latin-1'), dtype=np.uint8)
+        else:
+            dense = np.zeros(ord(present[-1]) + 1, dtype=np.int32)
+            dense[[ord(ch) for ch in present]] = np.arange(size)
+            chars = dense[np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)]
+        del joined
+        owner = np.repeat(np.arange(len(texts), dtype=np.int32), [len(t) + 1 for t in texts])[:-2]
+        # One int64 key per position, trigram then text id, computed in place: sorting
+        # it groups by trigram in text order and puts repeats within a text side by side
+        keys = chars[:-2].astype(np.int64)
+        for column in (chars[1:-1], chars[2:]):
+            keys *= size
+            keys += column
+        keys *= len(texts)
+        keys += owner
+        del chars
+        keys.sort()
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+        owner = np.empty(len(keys), dtype=np.int32)
+        np.remainder(keys, len(texts), out=owner, casting='unsafe')
+        codes = keys
+        codes //= len(texts)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        # Slices are views into one owner array
+        self.lists = dict(zip(codes[starts].tolist(), (owner[s:e] for s, e in zip(starts.tolist(), ends.tolist()))))
+
+    def get(self, gram):
+        """Ids of the texts containing gram, or None."""
+        try:
+            a, b, c = (self.alphabet[ch] for ch in gram)
+        except KeyError:
+            return None
+        return self.lists.get((a * self.size + b) * self.size + c)
+
+
+def fold(text):
+    """Lowercase, strip accents and turn punctuation into single spaces."""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = text.lower()
+    return ' '.join(re.sub(r"[^\w]+", " ", text).split())
+
+
+def edit_distance(a, b, limit=None):
+    """Levenshtein distance; stops early with limit + 1 once every path exceeds limit."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        left = i
+        for j, cb in enumerate(b):
+            # min() of three ints, unrolled: this loop is the hot path of fuzzy search
+            cost = previous[j] + (ca != cb)
+            up = previous[j + 1] + 1
+            if up < cost:
+                cost = up
+            if left + 1 < cost:
+                cost = left + 1
+            current.append(cost)
+            left = cost
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(a, b, floor=0.0):
+    """1 - normalized edit distance, or 0 when that is under floor."""
+    if not a or not b:
+        return 0.0
+    longest = max(len(a), len(b))
+    limit = int((1.0 - floor) * longest)
+    if abs(len(a) - len(b)) > limit:
+        return 0.0
+    distance = edit_distance(a, b, limit)
+    return 0.0 if distance > limit else 1.0 - distance / longest
+
+
+def text_score(query_tokens, name_tokens, cache):
+    """Mean over query words of the best-matching name word; prefixes of a word count as a match."""
+    if not query_tokens or not name_tokens:
+        return 0.0
+    total = 0.0
+    for q in query_tokens:
+        best = 0.0
+        for t in name_tokens:
+            key = (q, t)
+            if key not in cache:
+                cache[key] = 1.0 if t.startswith(q) else similarity(q, t, FUZZY_MIN_SCORE)
+            best = max(best, cache[key])
+        total += best
+    return total / len(query_tokens)
+
+
+def parse_rating(value):
+    try:
+        return float(str(value).replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def parse_reviews(value):
+    digits = re.sub(r"[^\d]", "", str(value or ""))
+    return int(digits) if digits else 0
+
+
+class SearchIndex:
+    def __init__(self, cafes):
+        self.cafes = cafes
+        # Lowercased once here instead of on every request
+        self.names = [(cafe.get('name') or '').lower() for cafe in cafes]
+        self.addresses = [(cafe.get('address') or '').lower() for cafe in cafes]
+        # Sorted id arrays; some trigrams (every address ends in "yogyakarta") cover nearly
+        # every cafe, so no second set copy is kept for the intersections
+        self.postings = TrigramPostings([f"{name}\0{address}" for name, address in zip(self.names, self.addresses)])
+
+        # Fuzzy mode: folded names padded with a space so word starts get their own trigrams
+        self.folded = [fold(cafe.get('name')) for cafe in cafes]
+        self.folded_tokens = [name.split() for name in self.folded]
+        self.fuzzy_postings = TrigramPostings([f" {name} " for name in self.folded])
+        ratings = np.array([parse_rating(cafe.get('rating')) for cafe in cafes], dtype=np.float64)
+        reviews = np.log1p([parse_reviews(cafe.get('reviews_count')) for cafe in cafes])
+        self.quality = (WEIGHT_RATING * ratings / 5.0
+                        + WEIGHT_REVIEWS * (reviews / reviews.max() if len(cafes) and reviews.max() else reviews))
+
+    def substring(self, query, limit=50):
+        """Cafes whose name or address contains query (case-insensitive), in file order."""
+        query = query.lower()
+        grams = trigrams(query)
+        if not grams:
+            # Shorter than a trigram: nothing to look up, scan the precomputed keys
+            return self._verify(query, range(len(self.cafes)), limit)
+        lists = [self.postings.get(gram) for gram in grams]
+        if any(ids is None for ids in lists):
+            return []
+        lists.sort(key=len)
+
+        results = []
+        # Walk the shortest list in chunks, so a query whose trigrams are in every
+        # address stops intersecting once `limit` matches are found
+        for start in range(0, len(lists[0]), SUBSTRING_CHUNK):
+            candidates = lists[0][start:start + SUBSTRING_CHUNK]
+            for other in lists[1:]:
+                # Both sides sorted: binary-search the candidates in the longer list
+                found = np.searchsorted(other, candidates)
+                found[found == len(other)] = 0
+                candidates = candidates[other[found] == candidates]
+                if not len(candidates):
+                    break
+            results.extend(self._verify(query, candidates.tolist(), limit - len(results)))
+            if len(results) >= limit:
+                break
+        return results
+
+    def _verify(self, query, candidates, limit):
+        results = []
+        for i in candidates:
+            if query in self.names[i] or query in self.addresses[i]:
+                results.append(self.cafes[i])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def fuzzy(self, query, limit=50):
+        """Typo-tolerant name search, best match first."""
+        folded = fold(query)
+        # Per query word and without the trailing pad, like text_score: a name with the words
+        # in another order, or a word that only starts with the query's, still has them all
+        prefix = set().union(*(trigrams(f" {word}") for word in folded.split()))
+        lists = {gram: self.fuzzy_postings.get(gram) for gram in prefix | trigrams(f" {folded} ")}
+        grams = [ids for ids in lists.values() if ids is not None]
+        if not grams:
+            return []
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.cafes))
+        hits = np.flatnonzero(shared)
+        cap = max(FUZZY_CANDIDATES, limit)
+        if len(hits) > cap:
+            # Cafes with all of the query's prefix trigrams first, best quality first: they
+            # all score about the same text, so quality picks the top ones when there are
+            # more than the cap. Partial matches follow, most shared trigrams first.
+            full = np.zeros(len(hits), dtype=bool)
+            if prefix and all(lists[gram] is not None for gram in prefix):
+                covered = np.bincount(np.concatenate([lists[gram] for gram in prefix]), minlength=len(self.cafes))
+                full = covered[hits] == len(prefix)
+            order = np.lexsort((-self.quality[hits], np.where(full, 0, -shared[hits]), ~full))
+            hits = np.sort(hits[order[:cap]])
+
+        query_tokens = folded.split()
+        # Names share most of their words ("kopi", "coffee"), so word pairs are scored once per query
+        cache = {}
+        scored = []
+        for i in hits:
+            text = text_score(query_tokens, self.folded_tokens[i], cache)
+            if text < FUZZY_MIN_SCORE:
+                # Whole-string match catches split or joined words ("kopiklotok")
+                text = similarity(folded, self.folded[i], FUZZY_MIN_SCORE)
+            if text >= FUZZY_MIN_SCORE:
+                scored.append((WEIGHT_TEXT * text + self.quality[i], i))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [self.cafes[i] for _, i in scored[:limit]]
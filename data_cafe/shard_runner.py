@@ -0,0 +1,234 @@
+"""
+Process-sharded version of batch_scraper.run_batch.
+
+Every region file (or, for large files, every hash shard of one) is a unit of
+work. Worker processes each start their own browser and pull units from a
+shared queue; a unit writes only to its own record log and its own journal
+(batch_journal.<unit>.jsonl), so processes never write the same file. The
+coordinator prints aggregated progress, compacts the shard logs into the
+region files once the workers have exited and returns non-zero if any
+worker failed.
+
+Usage:
+    python shard_runner.py --workers 4
+    python shard_runner.py --workers 6 --split-above 300 --delta --fast
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from scraper import CafeScraper
+from batch_scraper import region_files, process_file, get_needs_update, BATCH_JOURNAL
+from record_store import compact_region
+from scrape_metrics import ScrapeMetrics
+from rate_limiter import LimiterManager, DEFAULT_RATE
+from browser_lifecycle import BrowserLifecycle, add_lifecycle_arguments, lifecycle_options
+from scrape_journal import ScrapeJournal, discard_journal, DONE, FAILED, SKIPPED
+
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# Files with more cafes than this are split into hash shards
+DEFAULT_SPLIT_ABOVE = 200
+
+
+def unit_name(filepath, shard):
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    return f"{stem}.s{shard[0] + 1}of{shard[1]}" if shard else stem
+
+
+def unit_journal_path(journal_path, name):
+    stem, ext = os.path.splitext(journal_path)
+    return f"{stem}.{name}{ext}"
+
+
+def plan_units(split_above=DEFAULT_SPLIT_ABOVE, delta=False):
+    """(filepath, shard) units, largest first so the long ones start early."""
+    sized = []
+    for filepath in region_files():
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error loading {filepath}: {e}")
+            continue
+        queued = len(data) if delta else sum(1 for item in data if get_needs_update(item))
+        if not queued:
+            continue
+        # Shard count follows the file size only (not the queue or --workers), so a resumed
+        # run maps cafes to the same shard journals as the run it continues; workers just
+        # pull more or fewer units from the queue
+        shards = math.ceil(len(data) / split_above) if split_above else 1
+        if shards > 1:
+            for i in range(shards):
+                sized.append((queued / shards, filepath, (i, shards)))
+        else:
+            sized.append((queued, filepath, None))
+    sized.sort(key=lambda u: u[0], reverse=True)
+    return [(filepath, shard) for _, filepath, shard in sized]
+
+
+def _worker(worker_id, units, events, journal_path, block_resources, retry_failed, delta, metrics_path,
+            limiter, lifecycle_opts):
+    # Every process appends whole lines to the same metrics file
+    scraper = CafeScraper(metrics=ScrapeMetrics(metrics_path) if metrics_path else None)
+    try:
+        scraper.start_browser(headless=True, block_resources=block_resources)
+    except Exception as e:
+        print(f"[p{worker_id}] could not start browser: {e}")
+        sys.exit(2)
+    lifecycle = BrowserLifecycle(scraper, **lifecycle_opts)
+
+    ok = True
+    try:
+        while True:
+            try:
+                filepath, shard = units.get(timeout=1)
+            except queue.Empty:
+                break
+            name = unit_name(filepath, shard)
+            events.put(("start", worker_id, name, None))
+            journal = ScrapeJournal(unit_journal_path(journal_path, name))
+            try:
+                finished = process_file(scraper, filepath, journal, retry_failed, delta, shard,
+                                        on_result=lambda status: events.put(("result", worker_id, name, status)),
+                                        lifecycle=lifecycle, limiter=limiter)
+            except Exception as e:
+                print(f"[p{worker_id}] ! {name} aborted: {e}")
+                finished = False
+            ok = ok and finished
+            events.put(("finish", worker_id, name, finished))
+    finally:
+        lifecycle.close()
+        scraper.close_browser()
+        print(f"[p{worker_id}] Browser lifecycle: {lifecycle.summary()}")
+    sys.exit(0 if ok else 1)
+
+
+class ShardProgress:
+    def __init__(self, units):
+        self.started = time.time()
+        self.counts = {unit_name(f, s): {DONE: 0, FAILED: 0, SKIPPED: 0} for f, s in units}
+        self.running = {}
+        self.finished = set()
+
+    def apply(self, event):
+        kind, worker_id, name, value = event
+        if kind == "start":
+            self.running[worker_id] = name
+        elif kind == "result":
+            self.counts[name][value] = self.counts[name].get(value, 0) + 1
+        elif kind == "finish":
+            self.running.pop(worker_id, None)
+            self.finished.add(name)
+
+    def line(self):
+        done = sum(c[DONE] for c in self.counts.values())
+        failed = sum(c[FAILED] for c in self.counts.values())
+        skipped = sum(c[SKIPPED] for c in self.counts.values())
+        elapsed = max(time.time() - self.started, 1e-6)
+        return (f"{len(self.finished)}/{len(self.counts)} units, {done} done, {failed} failed, "
+                f"{skipped} skipped, {(done + failed + skipped) * 3600 / elapsed:.1f} cafes/hour")
+
+
+def run_sharded(workers=DEFAULT_WORKERS, split_above=DEFAULT_SPLIT_ABOVE, block_resources=False,
+                journal_path=BATCH_JOURNAL, retry_failed=False, delta=False, report_every=60,
+                metrics_path=None, rate=DEFAULT_RATE, **lifecycle_opts):
+    """
+    Returns the process exit code: 0 when every worker finished cleanly.
+    rate is the starting pace in cafes per second for the whole run. Every process
+    hits Google from the same IP, so they share one limiter served by a LimiterManager:
+    a captcha in one worker backs off all of them.
+    """
+    # Fold in anything a crashed run left behind before shards read the region files
+    for filepath in region_files():
+        compact_region(filepath)
+
+    units = plan_units(split_above, delta)
+    if not units:
+        print("Nothing to scrape.")
+        return 0
+    workers = min(workers, len(units))
+    print(f"{len(units)} units over {workers} worker processes:")
+    for filepath, shard in units:
+        print(f"  {unit_name(filepath, shard)}")
+
+    unit_queue = multiprocessing.Queue()
+    for unit in units:
+        unit_queue.put(unit)
+    events = multiprocessing.Queue()
+    manager = LimiterManager()
+    manager.start()
+    limiter = manager.AdaptiveRateLimiter(rate)
+    procs = [multiprocessing.Process(target=_worker, name=f"shard-worker-{w}",
+                                     args=(w, unit_queue, events, journal_path, block_resources, retry_failed, delta,
+                                           metrics_path, limiter, lifecycle_opts))
+             for w in range(workers)]
+    for p in procs:
+        p.start()
+
+    progress = ShardProgress(units)
+    last_report = time.time()
+    try:
+        # Drain events until every worker is gone; joining first could block on a full pipe
+        while any(p.is_alive() for p in procs) or not events.empty():
+            try:
+                progress.apply(events.get(timeout=1))
+            except queue.Empty:
+                pass
+            if time.time() - last_report >= report_every:
+                print(f"\n--- Shard progress: {progress.line()} ---")
+                last_report = time.time()
+    finally:
+        for p in procs:
+            p.join()
+        limiter_summary = limiter.summary()
+        manager.shutdown()
+        for filepath in sorted({f for f, _ in units}):
+            compact_region(filepath)
+
+    exit_codes = {p.name: p.exitcode for p in procs}
+    unfinished = [name for name in progress.counts if name not in progress.finished]
+    print("\n=== Shard Summary ===")
+    print(f"  {progress.line()}")
+    print(f"  rate limiter: {limiter_summary}")
+    for name, code in exit_codes.items():
+        print(f"  {name}: exit code {code}")
+    if unfinished:
+        print(f"  unfinished units: {', '.join(unfinished)}")
+
+    failed = any(code != 0 for code in exit_codes.values()) or bool(unfinished)
+    # Same rule as run_batch: a completed cycle starts the next one with only the failed entries
+    if not failed:
+        for filepath, shard in units:
+            ScrapeJournal(unit_journal_path(journal_path, unit_name(filepath, shard))).archive()
+        print("Archived unit journals.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-scrape region files with one browser per worker process")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--split-above", type=int, default=DEFAULT_SPLIT_ABOVE,
+                        help="hash-shard files with more cafes than this (0 = never split)")
+    parser.add_argument("--fast", action="store_true",
+                        help="block fonts, map tiles, analytics and non-photo images")
+    parser.add_argument("--delta", action="store_true",
+                        help="refresh all cafes, re-running only sections whose counts changed")
+    parser.add_argument("--journal", default=BATCH_JOURNAL, help="journal name; each unit gets <stem>.<unit>.jsonl")
+    parser.add_argument("--retry-failed", action="store_true", help="only rerun tasks the journals mark as failed")
+    parser.add_argument("--fresh", action="store_true", help="discard the unit journals and start the cycle over")
+    parser.add_argument("--report-every", type=int, default=60, help="seconds between progress reports")
+    parser.add_argument("--metrics", help="append per-cafe phase timings to this JSONL file")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE * 60,
+                        help="starting pace for all worker processes together, in cafes per minute")
+    add_lifecycle_arguments(parser)
+    args = parser.parse_args()
+    if args.fresh:
+        for filepath, shard in plan_units(args.split_above, args.delta):
+            discard_journal(unit_journal_path(args.journal, unit_name(filepath, shard)))
+    sys.exit(run_sharded(args.workers, args.split_above, block_resources=args.fast, journal_path=args.journal,
+                         retry_failed=args.retry_failed, delta=args.delta, report_every=args.report_every,
+                         metrics_path=args.metrics, rate=args.rate / 60, **lifecycle_options(args)))
@@ -0,0 +1,6 @@
+# From data_cafe: pip install -r requirements-dev.txt, then python -m pytest -q tests
+import os
+import sys
+
+# The API modules are flat files in data_cafe/, imported the way main.py imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+import failure_policy
+from failure_policy import (
+    BLOCKED, BROWSER, MISSING_PLACE, NETWORK, NOT_FOUND, PARSE, RETRY_POLICIES, TIMEOUT, UNKNOWN,
+    FailureTracker, RetryPolicy, RetryQueue, classify_failure, dead_letter_path,
+)
+
+
+# Playwright's TimeoutError is matched by class name, which the builtin shares
+@pytest.mark.parametrize("error, stage, blocked, expected", [
+    (TimeoutError("Timeout 30000ms exceeded"), 'load', False, TIMEOUT),
+    (TimeoutError("waiting for h1.DUwDvf"), 'place', False, MISSING_PLACE),
+    (Exception("page.goto: net::ERR_INTERNET_DISCONNECTED"), 'load', False, NETWORK),
+    (Exception("Target page, context or browser has been closed"), 'extract', False, BROWSER),
+    (KeyError("reviews"), 'extract', False, PARSE),
+    (TimeoutError("Timeout 5000ms exceeded"), 'load', True, BLOCKED),
+    (None, None, False, UNKNOWN),
+])
+def test_classify_failure(error, stage, blocked, expected):
+    assert classify_failure(error, stage, blocked) == expected
+
+
+def test_backoff_doubles_up_to_the_cap():
+    policy = RetryPolicy(5, base_delay=20, max_delay=60)
+    assert [policy.delay(attempt) for attempt in (1, 2, 3, 4)] == [20, 40, 60, 60]
+
+
+def test_dead_letter_path_sits_next_to_the_journal(tmp_path):
+    assert dead_letter_path(str(tmp_path / "scrape_journal_x.jsonl")) == str(tmp_path / "dead_letters_scrape_journal_x.jsonl")
+
+
+def test_tracker_retries_transient_failures_until_attempts_run_out(tmp_path):
+    tracker = FailureTracker(str(tmp_path / "dead.jsonl"))
+    queue = RetryQueue()
+    task = {"name": "Kopi Klotok", "address": "Jl. Kaliurang"}
+    attempts = RETRY_POLICIES[TIMEOUT].max_attempts
+    for attempt in range(1, attempts):
+        assert tracker.retry_or_dead_letter(queue, "payload", task, TIMEOUT, attempt)
+    assert len(queue) == attempts - 1
+    assert not tracker.retry_or_dead_letter(queue, "payload", task, TIMEOUT, attempts)
+
+    with open(tmp_path / "dead.jsonl", encoding='utf-8') as f:
+        (entry,) = [json.loads(line) for line in f]
+    assert (entry["name"], entry["class"], entry["attempts"]) == ("Kopi Klotok", TIMEOUT, attempts)
+    assert (tracker.retried, tracker.dead, tracker.counts) == (attempts - 1, 1, {TIMEOUT: attempts})
+
+
+def test_not_found_is_dead_lettered_at_once(tmp_path):
+    tracker = FailureTracker(str(tmp_path / "dead.jsonl"))
+    queue = RetryQueue()
+    assert not tracker.retry_or_dead_letter(queue, "payload", {"name": "Nowhere"}, NOT_FOUND, 1)
+    assert len(queue) == 0 and tracker.dead == 1
+
+
+def test_unknown_class_uses_the_unknown_policy(tmp_path):
+    tracker = FailureTracker(str(tmp_path / "dead.jsonl"))
+    assert tracker.retry_delay("something_new", 1) == RETRY_POLICIES[UNKNOWN].delay(1)
+    assert tracker.retry_delay("something_new", RETRY_POLICIES[UNKNOWN].max_attempts) is None
+
+
+def test_retry_queue_serves_fresh_tasks_in_order_and_due_retries_first(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(failure_policy.time, "time", lambda: clock[0])
+    monkeypatch.setattr(failure_policy.time, "sleep", lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+
+    queue = RetryQueue(["a", "b", "c"])
+    assert queue.next() == ("a", 1)
+    queue.requeue("a", 2, delay=30)
+    # Not due yet: fresh tasks keep going
+    assert queue.next() == ("b", 1)
+    clock[0] += 30
+    assert queue.next() == ("a", 2)
+    queue.requeue("b", 2, delay=20)
+    queue.requeue("a", 3, delay=10)
+    assert queue.next() == ("c", 1)
+    # Only delayed retries left: next() waits for the earliest one
+    assert queue.next() == ("a", 3)
+    assert clock[0] == 1040.0
+    assert queue.next() == ("b", 2)
+    assert queue.next() is None
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from geo import GeoIndex, extract_coords_from_link, haversine_km
+
+
+@pytest.fixture(scope="module")
+def cafes():
+    rng = random.Random(11)
+    cafes = []
+    for i in range(2000):
+        lat, lng = rng.uniform(-8.2, -7.7), rng.uniform(110.0, 110.8)
+        cafes.append({"name": f"cafe {i}", "link": f"https://www.google.com/maps/place/x/@{lat:.7f},{lng:.7f},17z"})
+    cafes.append({"name": "no link", "link": None})
+    return cafes
+
+
+def brute_force(cafes, lat, lng, radius_km, limit):
+    points = [(c, extract_coords_from_link(c["link"])) for c in cafes]
+    points = [(c, xy) for c, xy in points if xy]
+    distances = haversine_km(lat, lng, [xy[0] for _, xy in points], [xy[1] for _, xy in points])
+    ranked = sorted((float(d), i) for i, d in enumerate(distances) if d <= radius_km)
+    return [(points[i][0], d) for d, i in ranked[:limit]]
+
+
+def test_extract_coords():
+    assert extract_coords_from_link("https://maps.google.com/?q=x@-7.8,110.36,17z") == (-7.8, 110.36)
+    assert extract_coords_from_link("https://www.google.com/maps/place/x/data=!3d-7.91!4d110.52") == (-7.91, 110.52)
+    assert extract_coords_from_link("https://maps.google.com/?ll=-7.8,110.4") == (-7.8, 110.4)
+    assert extract_coords_from_link("https://maps.google.com/") is None
+
+
+def test_haversine_one_degree_of_latitude():
+    assert haversine_km(0.0, 110.0, [1.0], [110.0])[0] == pytest.approx(111.19, abs=0.01)
+
+
+@pytest.mark.parametrize("lat, lng, radius_km, limit", [
+    (-7.8, 110.36, 0.5, 20),
+    (-7.95, 110.6, 3.0, 20),
+    (-7.95, 110.6, 3.0, 1000),
+    (-7.9, 110.4, 200.0, 50),
+    (-7.0, 112.0, 5.0, 20),
+])
+def test_nearby_matches_brute_force(cafes, lat, lng, radius_km, limit):
+    index = GeoIndex(cafes)
+    assert len(index) == len(cafes) - 1
+    got = index.nearby(lat, lng, radius_km, limit)
+    expected = brute_force(cafes, lat, lng, radius_km, limit)
+    assert [c["name"] for c, _ in got] == [c["name"] for c, _ in expected]
+    assert [d for _, d in got] == pytest.approx([d for _, d in expected])
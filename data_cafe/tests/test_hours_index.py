@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from hours_index import SLOTS_PER_DAY, HoursIndex, compile_week, parse_hours_row, week_slot
+
+
+def slot(day, hour, minute=0):
+    return day * SLOTS_PER_DAY + (hour * 60 + minute) // 15
+
+
+def test_parse_indonesian_row():
+    assert parse_hours_row("Senin08.00–23.00") == (0, [(8 * 60, 23 * 60)])
+
+
+def test_parse_split_day():
+    assert parse_hours_row("Sabtu08.00–12.0013.00–22.00") == (5, [(8 * 60, 12 * 60), (13 * 60, 22 * 60)])
+
+
+def test_parse_closed_and_all_day():
+    assert parse_hours_row("MingguTutup") == (6, [])
+    assert parse_hours_row("FridayOpen 24 hours") == (4, [(0, 24 * 60)])
+
+
+def test_opening_time_shares_closing_suffix():
+    assert parse_hours_row("Monday \t 9.00–11.00 pm \t ") == (0, [(21 * 60, 23 * 60)])
+    assert parse_hours_row("Monday 9.00 am–10.00 pm") == (0, [(9 * 60, 22 * 60)])
+
+
+def test_unreadable_row():
+    assert parse_hours_row("Hours might differ") is None
+    assert parse_hours_row("Senin") is None
+
+
+def test_compile_split_day():
+    week = compile_week(["Sabtu08.00–12.0013.00–22.00"])
+    assert week[slot(5, 8)] and week[slot(5, 11, 45)]
+    assert not week[slot(5, 12)] and not week[slot(5, 12, 45)]
+    assert week[slot(5, 13)] and not week[slot(5, 22)]
+
+
+def test_compile_after_midnight_spills_into_next_day():
+    week = compile_week(["Tuesday 9.00 pm–2.00 am"])
+    assert not week[slot(1, 20, 45)] and week[slot(1, 23, 45)]
+    assert week[slot(2, 1, 45)] and not week[slot(2, 2)]
+
+
+def test_compile_sunday_night_wraps_to_monday():
+    week = compile_week(["Minggu20.00–01.00"])
+    assert week[slot(6, 23)] and week[slot(0, 0, 30)]
+    assert not week[slot(0, 1)]
+
+
+def test_compile_without_readable_rows():
+    assert compile_week(None) is None
+    assert compile_week(["Hours might differ"]) is None
+    assert not compile_week(["SeninTutup"]).any()
+
+
+def test_open_mask():
+    cafes = [
+        {"opening_hours": ["Senin08.00–23.00"]},
+        {"opening_hours": ["Monday 9.00 pm–2.00 am"]},
+        {"opening_hours": None},
+    ]
+    index = HoursIndex(cafes)
+    assert index.known.tolist() == [True, True, False]
+    # 2026-10-19 is a Monday
+    assert index.open_mask(datetime(2026, 10, 19, 10, 0)).tolist() == [True, False, False]
+    assert index.open_mask(datetime(2026, 10, 20, 1, 0)).tolist() == [False, True, False]
+    assert index.open_at(datetime(2026, 10, 19, 22, 0)) == cafes[:2]
+    assert week_slot(datetime(2026, 10, 19, 22, 0)) == slot(0, 22)
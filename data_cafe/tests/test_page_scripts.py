@@ -0,0 +1,11 @@
+from page_scripts import whole_text
+
+
+def test_whole_text_does_not_match_longer_chips():
+    menu = whole_text("Menu")
+    assert menu.search("Menu") and menu.search(" Menu\n")
+    assert not menu.search("Menu Minuman")
+    assert not menu.search("Lihat Menu")
+    # Chip labels are escaped, not read as patterns
+    assert whole_text("Food & drink (12)").search("Food & drink (12)")
+    assert not whole_text("Menu (1)").search("Menu 1")
@@ -0,0 +1,111 @@
+import json
+import shutil
+
+import pytest
+
+from record_store import RecordStore, compact_region, place_id_from_link, region_file_for_log
+
+LINK_A = "https://www.google.com/maps/place/Kopi+Klotok/data=!4m7!3m6!1s0x2e7a5f:0x44fd01!8m2"
+LINK_B = "https://www.google.com/maps/place/Sintas/data=!4m7!3m6!1s0x2e7b11:0x9c0a02!8m2"
+
+
+@pytest.fixture
+def region(tmp_path):
+    path = tmp_path / "cafe_data_Sleman.json"
+    path.write_text(json.dumps([
+        {"name": "Kopi Klotok", "link": LINK_A, "rating": "4,6"},
+        {"name": "Sintas Coffee", "link": LINK_B, "rating": "4,5"},
+        {"name": "Warung Kopi", "rating": "4,1"},
+    ]), encoding='utf-8')
+    return str(path)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_log_names():
+    assert place_id_from_link(LINK_A) == "0x2e7a5f:0x44fd01"
+    assert place_id_from_link("https://maps.google.com/?q=kopi") is None
+    assert region_file_for_log("cafe_data_Sleman.jsonl") == "cafe_data_Sleman.json"
+    assert region_file_for_log("cafe_data_Sleman.s2of4.jsonl") == "cafe_data_Sleman.json"
+
+
+def test_compaction_matches_place_id_then_replace_name_then_own_name(region):
+    store = RecordStore(region)
+    # Renamed on Maps, same place: the place id wins over both names
+    store.append({"name": "Kopi Klotok Pakem", "link": LINK_A, "rating": "4,7"}, replace_name="Warung Kopi")
+    # No place id: the name the writer asked to replace wins over the record's own name
+    store.append({"name": "Sintas Coffee", "rating": "4,8"}, replace_name="warung  KOPI")
+    # Neither: matched by its own (normalized) name, which now points at the entry just written
+    store.append({"name": "sintas coffee", "rating": "4,9"})
+    store.append({"name": "Kedai Baru", "rating": "4,0"})
+
+    assert store.compact() == 4
+    assert load(region) == [
+        {"name": "Kopi Klotok Pakem", "link": LINK_A, "rating": "4,7"},
+        {"name": "Sintas Coffee", "link": LINK_B, "rating": "4,5"},
+        {"name": "sintas coffee", "rating": "4,9"},
+        {"name": "Kedai Baru", "rating": "4,0"},
+    ]
+    assert store.compact() == 0
+
+
+def test_later_entries_see_earlier_ones(region):
+    store = RecordStore(region)
+    store.append({"name": "Kedai Baru", "rating": "4,0"})
+    store.append({"name": "Kedai Baru", "rating": "4,2"})
+    store.compact()
+    assert [c["name"] for c in load(region)].count("Kedai Baru") == 1
+    assert load(region)[-1]["rating"] == "4,2"
+
+
+def test_torn_last_line_is_skipped_and_next_append_survives(region):
+    store = RecordStore(region)
+    store.append({"name": "Kedai Baru", "rating": "4,0"})
+    with open(store.log_path, 'a', encoding='utf-8') as f:
+        f.write('{"replace": "Kopi Klotok", "record": {"name": "Kopi')
+
+    # A new process appends after the crash
+    RecordStore(region).append({"name": "Kedai Lain", "rating": "3,9"})
+    assert RecordStore(region).compact() == 2
+    names = [c["name"] for c in load(region)]
+    assert names == ["Kopi Klotok", "Sintas Coffee", "Warung Kopi", "Kedai Baru", "Kedai Lain"]
+
+
+def test_compaction_rerun_after_crash_is_idempotent(region, tmp_path):
+    store = RecordStore(region)
+    store.append({"name": "Kopi Klotok Pakem", "link": LINK_A, "rating": "4,7"}, replace_name="Kopi Klotok")
+    store.append({"name": "Sintas Roastery", "rating": "4,8"}, replace_name="Sintas Coffee")
+    store.append({"name": "Kedai Baru", "rating": "4,0"})
+    saved_log = tmp_path / "saved.jsonl"
+    shutil.copy(store.log_path, saved_log)
+    store.compact()
+    once = load(region)
+
+    # Killed after the JSON was replaced but before the log was removed
+    shutil.copy(saved_log, store.log_path)
+    assert RecordStore(region).compact() == 3
+    assert load(region) == once
+
+
+def test_shard_logs_are_folded_by_region(region):
+    RecordStore(region, shard="s1of2").append({"name": "Kedai Satu"})
+    RecordStore(region, shard="s2of2").append({"name": "Kedai Dua"})
+    RecordStore(region).append({"name": "Warung Kopi", "rating": "4,3"})
+    assert compact_region(region) == 3
+    current = load(region)
+    assert [c["name"] for c in current][-2:] == ["Kedai Satu", "Kedai Dua"]
+    assert current[2]["rating"] == "4,3"
+    assert RecordStore(region).shard_stores() == []
+
+
+def test_contains_sees_file_and_log(region):
+    store = RecordStore(region)
+    assert store.contains(name="  kopi KLOTOK ")
+    assert store.contains(name="Renamed", link=LINK_B + "?hl=id")
+    assert not store.contains(name="Kedai Baru")
+    store.append({"name": "Kedai Baru"})
+    assert store.contains(name="kedai baru")
+    assert RecordStore(region).contains(name="Kedai Baru")
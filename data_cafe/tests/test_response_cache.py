@@ -0,0 +1,119 @@
+import json
+import os
+import time
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from response_cache import ResponseCache, dataset_version
+
+
+def make_client(cache, payload):
+    app = FastAPI()
+
+    @app.get("/items")
+    def items(request: Request):
+        payload["builds"] += 1
+        return cache.respond(request, ("items",), lambda: payload["items"])
+
+    return TestClient(app)
+
+
+def test_etag_round_trip_gives_304():
+    cache = ResponseCache()
+    cache.set_version("v1")
+    client = make_client(cache, {"items": [{"name": "Kopi Klotok"}], "builds": 0})
+
+    first = client.get("/items")
+    assert first.status_code == 200
+    assert first.json() == [{"name": "Kopi Klotok"}]
+    etag = first.headers["etag"]
+
+    again = client.get("/items", headers={"If-None-Match": f'"other", {etag}'})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.get("/items", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert cache.summary()["misses"] == 1
+
+
+def test_new_version_drops_cached_bodies():
+    cache = ResponseCache()
+    cache.set_version("v1")
+    payload = {"items": [1], "builds": 0}
+    client = make_client(cache, payload)
+    etag = client.get("/items").headers["etag"]
+
+    payload["items"] = [2]
+    # Same version: still served from the cache
+    assert client.get("/items").json() == [1]
+    cache.set_version("v2")
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == [2]
+    assert response.headers["etag"] != etag
+    assert cache.summary()["entries"] == 1
+
+
+def test_lru_bounds():
+    cache = ResponseCache(max_entries=2)
+    cache.set_version("v1")
+    for key in "abc":
+        cache.get(key, lambda: [key])
+    assert list(cache.entries) == ["b", "c"]
+    cache = ResponseCache(max_bytes=8)
+    cache.set_version("v1")
+    body, _ = cache.get("big", lambda: ["x" * 20])
+    assert body and "big" not in cache.entries
+
+
+def test_dataset_version_changes_with_files(tmp_path):
+    path = tmp_path / "cafe_data_X.json"
+    missing = dataset_version([str(path)])
+    path.write_text("[]")
+    written = dataset_version([str(path)])
+    assert written != missing
+    path.write_text("[{}]")
+    assert dataset_version([str(path)]) != written
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    import main
+
+    region = tmp_path / "cafe_data_Sleman.json"
+    region.write_text(json.dumps([{"name": "Kopi Klotok", "opening_hours": ["Senin08.00–23.00"]}]))
+    monkeypatch.setattr(main, "REGIONS", {"sleman": str(region)})
+    monkeypatch.setattr(main, "RELOAD_CHECK_SECONDS", 0.0)
+    main.load_data()
+    yield main, region
+    monkeypatch.undo()
+    main.load_data()
+
+
+def test_region_file_change_reloads_and_invalidates(api):
+    main, region = api
+    client = TestClient(main.app)
+    first = client.get("/cafes")
+    assert [c["name"] for c in first.json()] == ["Kopi Klotok"]
+    assert client.get("/cafes", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    region.write_text(json.dumps([{"name": "Kopi Klotok"}, {"name": "Sintas Coffee"}]))
+    os.utime(region, ns=(time.time_ns(), time.time_ns() + 10**9))
+    second = client.get("/cafes", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert [c["name"] for c in second.json()] == ["Kopi Klotok", "Sintas Coffee"]
+    assert client.get("/search", params={"q": "sintas"}).json()[0]["name"] == "Sintas Coffee"
+
+
+def test_open_endpoint_is_cached_per_slot(api):
+    main, _ = api
+    client = TestClient(main.app)
+    # 2026-10-19 is a Monday
+    first = client.get("/cafes/open", params={"at": "2026-10-19T10:00:00"})
+    assert [c["name"] for c in first.json()] == ["Kopi Klotok"]
+    same_slot = client.get("/cafes/open", params={"at": "2026-10-19T10:10:00"},
+                           headers={"If-None-Match": first.headers["etag"]})
+    assert same_slot.status_code == 304
+    assert client.get("/cafes/open", params={"at": "2026-10-19T23:30:00"}).json() == []
@@ -0,0 +1,72 @@
+import glob
+import os
+
+from batch_scheduler import journal_history
+from scrape_journal import DONE, FAILED, SKIPPED, ScrapeJournal, task_key
+
+TASKS = [("Kopi Klotok", "Jl. Kaliurang"), ("Sintas Coffee", "Wonosari"), ("Warung Kopi", "Wates")]
+
+
+def run_pass(path, retry_failed=False, failing=()):
+    """What every run loop does: select from the journal, record each outcome, archive at the end."""
+    journal = ScrapeJournal(path)
+    ran = []
+    for name, address in TASKS:
+        key = task_key(name, address)
+        if not journal.should_run(key, retry_failed):
+            continue
+        ran.append(name)
+        journal.record(key, FAILED if name in failing else DONE, "not_found" if name in failing else None)
+    journal.archive()
+    return ran
+
+
+def test_retry_failed_after_archive_runs_only_the_failed_cafe(tmp_path):
+    path = str(tmp_path / "scrape_journal_list.jsonl")
+    assert run_pass(path, failing={"Sintas Coffee"}) == ["Kopi Klotok", "Sintas Coffee", "Warung Kopi"]
+    assert run_pass(path, retry_failed=True) == ["Sintas Coffee"]
+    # Retried successfully: nothing left to retry, and the next cycle starts from scratch
+    assert run_pass(path, retry_failed=True) == []
+    assert run_pass(path) == ["Kopi Klotok", "Sintas Coffee", "Warung Kopi"]
+
+
+def test_archive_keeps_history_and_carries_failures(tmp_path):
+    path = str(tmp_path / "scrape_journal_list.jsonl")
+    run_pass(path, failing={"Sintas Coffee"})
+    archives = glob.glob(str(tmp_path / "scrape_journal_list_*.jsonl"))
+    assert len(archives) == 1
+    assert len(ScrapeJournal(archives[0]).entries) == 3
+    carried = ScrapeJournal(path)
+    assert list(carried.entries) == [task_key("Sintas Coffee", "Wonosari")]
+    assert carried.entries[task_key("Sintas Coffee", "Wonosari")]["attempts"] == 1
+    assert not os.path.exists(path + ".tmp")
+    # The carried copy is the same entry as the archived one, not a second failure
+    assert journal_history(path)[task_key("Sintas Coffee", "Wonosari")]["failures"] == 1
+
+
+def test_resume_skips_handled_tasks_and_last_line_wins(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ScrapeJournal(path)
+    journal.record("a|", DONE)
+    journal.record("b|", FAILED, "timeout")
+    journal.record("c|", SKIPPED, "category")
+    journal.record("b|", DONE)
+
+    resumed = ScrapeJournal(path)
+    assert resumed.counts() == {DONE: 2, SKIPPED: 1}
+    assert resumed.entries["b|"]["attempts"] == 2
+    assert [key for key in ("a|", "b|", "c|", "d|") if resumed.should_run(key)] == ["d|"]
+    assert [key for key in ("a|", "b|", "c|", "d|") if resumed.should_run(key, retry_failed=True)] == []
+
+
+def test_torn_last_line_is_ignored_and_terminated(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ScrapeJournal(path)
+    journal.record("a|", DONE)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "b|", "sta')
+
+    resumed = ScrapeJournal(path)
+    assert list(resumed.entries) == ["a|"]
+    resumed.record("c|", FAILED, "timeout")
+    assert list(ScrapeJournal(path).entries) == ["a|", "c|"]
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from search_index import (
+    FUZZY_MIN_SCORE, WEIGHT_TEXT, SearchIndex, TrigramPostings, fold, similarity, text_score, trigrams,
+)
+
+WORDS = ["kopi", "coffee", "kafe", "warung", "klotok", "angkringan", "joglo", "sawah", "roastery", "café",
+         "Jl.", "Wonosari", "Wates", "Gunung Kidul", "Kulon Progo", "Yogyakarta", "No. 12", "RT 03"]
+
+
+@pytest.fixture(scope="module")
+def cafes():
+    rng = random.Random(7)
+    return [{"name": " ".join(rng.sample(WORDS[:10], rng.randint(1, 3))).title(),
+             "address": ", ".join(rng.sample(WORDS[10:], 3)),
+             "rating": f"{rng.uniform(3, 5):.1f}".replace(".", ","),
+             "reviews_count": str(rng.randint(0, 2000))} for _ in range(3000)]
+
+
+@pytest.fixture(scope="module")
+def index(cafes):
+    return SearchIndex(cafes)
+
+
+def linear_scan(cafes, query, limit=50):
+    query = query.lower()
+    return [c for c in cafes if query in c["name"].lower() or query in c["address"].lower()][:limit]
+
+
+def brute_force_fuzzy(index, query, limit=50):
+    """fuzzy() scoring applied to every cafe, without the candidate cut."""
+    folded = fold(query)
+    scored = []
+    for i, name in enumerate(index.folded):
+        text = text_score(folded.split(), index.folded_tokens[i], {})
+        if text < FUZZY_MIN_SCORE:
+            text = similarity(folded, name, FUZZY_MIN_SCORE)
+        if text >= FUZZY_MIN_SCORE:
+            scored.append((WEIGHT_TEXT * text + index.quality[i], i))
+    scored.sort(key=lambda s: (-s[0], s[1]))
+    return [index.cafes[i] for _, i in scored[:limit]]
+
+
+@pytest.mark.parametrize("query", ["kopi", "KOPI", "yogyakarta", "fé w", "rt 0", "wa", "k", "", "zzzq", "kopi kopi"])
+def test_substring_matches_linear_scan(cafes, index, query):
+    assert index.substring(query) == linear_scan(cafes, query)
+    assert index.substring(query, limit=5000) == linear_scan(cafes, query, limit=5000)
+
+
+def test_postings_match_per_text_trigrams():
+    texts = ["kopi klotok", "", "kk", "kopi kopi", "café joglo", "ünïcode ☕ kopi"]
+    postings = TrigramPostings(texts)
+    expected = {}
+    for i, text in enumerate(texts):
+        for gram in trigrams(text):
+            expected.setdefault(gram, []).append(i)
+    for gram, ids in expected.items():
+        assert postings.get(gram).tolist() == ids
+    assert postings.get("zzz") is None
+
+
+def test_fold():
+    assert fold("Kopi  Klothok!") == "kopi klothok"
+    assert fold("Café Señor's") == "cafe senor s"
+    assert fold(None) == ""
+
+
+@pytest.mark.parametrize("query", ["coffee", "kopi", "kop", "kopi klotok", "angkringna", "cafe", "joglo sawah"])
+def test_fuzzy_matches_brute_force(index, query):
+    # More full matches than FUZZY_CANDIDATES for most of these, so the cap is exercised
+    assert index.fuzzy(query) == brute_force_fuzzy(index, query)
+
+
+def test_fuzzy_tolerates_typos_and_prefixes(index):
+    assert "angkringan" in fold(index.fuzzy("angkringna")[0]["name"])
+    assert all("klotok" in fold(c["name"]) for c in index.fuzzy("klot"))
@@ -2,10 +2,10 @@
 Script to extract latitude/longitude from Google Maps links and update the cafes table.
 """
 import os
-import re
 import json
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from geo import extract_coords_from_link
 
 # Load env
 env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -28,28 +28,6 @@ REGIONS = {
     "gunung_kidul": "cafe_data_Gunung_Kidul.json"
 }
 
-def extract_coords_from_link(link: str) -> tuple[float, float] | None:
-    """Extract latitude and longitude from Google Maps link."""
-    if not link:
-        return None
-    
-    # Pattern 1: @lat,lng,zoom in URL
-    match = re.search(r'@(-?\d+\.\d+),(-?\d+\.\d+)', link)
-    if match:
-        return float(match.group(1)), float(match.group(2))
-    
-    # Pattern 2: !3d{lat}!4d{lng} in URL
-    match = re.search(r'!3d(-?\d+\.\d+)!4d(-?\d+\.\d+)', link)
-    if match:
-        return float(match.group(1)), float(match.group(2))
-    
-    # Pattern 3: ll={lat},{lng} in query params
-    match = re.search(r'll=(-?\d+\.\d+),(-?\d+\.\d+)', link)
-    if match:
-        return float(match.group(1)), float(match.group(2))
-    
-    return None
-
 def update_coordinates():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     